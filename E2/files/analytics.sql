@@ -0,0 +1,106 @@
+-- Tabela de factos para análise do histórico de consultas; executar depois de db_init.sql.
+-- Cada linha é uma observação ou um medicamento receitado numa consulta, já com a clínica,
+-- o médico, a especialidade, a data partida em ano/mês/dia e a idade do paciente nesse dia,
+-- para que os relatórios (receitas por clínica/mês/especialidade, distribuição dos valores
+-- de cada parâmetro) não façam joins nem leiam consulta, receita e observacao.
+--
+-- Não é uma MATERIALIZED VIEW porque REFRESH recalcula tudo: refresh_historial_paciente()
+-- só acrescenta as consultas com id acima da última marca. Só entram consultas já realizadas
+-- (data anterior a hoje); as futuras podem ainda ser canceladas ou receber receitas, por isso
+-- ficam em historial_paciente_pendente e entram no primeiro refresh depois da sua data.
+
+DROP TABLE IF EXISTS historial_paciente;
+DROP TABLE IF EXISTS historial_paciente_marca;
+DROP TABLE IF EXISTS historial_paciente_pendente;
+
+CREATE TABLE historial_paciente(
+id INTEGER NOT NULL,
+ssn CHAR(11) NOT NULL,
+nif CHAR(9) NOT NULL,
+nome VARCHAR(80) NOT NULL,
+data DATE NOT NULL,
+ano SMALLINT NOT NULL,
+mes SMALLINT NOT NULL,
+dia_do_mes SMALLINT NOT NULL,
+dia_da_semana SMALLINT NOT NULL,
+especialidade VARCHAR(80) NOT NULL,
+idade SMALLINT NOT NULL,
+tipo VARCHAR(10) NOT NULL CHECK (tipo IN ('observacao', 'receita')),
+chave VARCHAR(155) NOT NULL,
+valor FLOAT,
+PRIMARY KEY (id, tipo, chave)
+);
+
+CREATE INDEX historial_paciente_receita_idx ON historial_paciente (nome, ano, mes, especialidade) WHERE tipo = 'receita';
+CREATE INDEX historial_paciente_chave_idx ON historial_paciente (tipo, chave) INCLUDE (valor);
+
+-- Última consulta processada (linha única)
+CREATE TABLE historial_paciente_marca(
+ultimo_id INTEGER NOT NULL,
+atualizado TIMESTAMP NOT NULL
+);
+INSERT INTO historial_paciente_marca VALUES (0, LOCALTIMESTAMP);
+
+-- Consultas já vistas (id até à marca) mas ainda por realizar
+CREATE TABLE historial_paciente_pendente(
+id INTEGER PRIMARY KEY
+);
+
+CREATE OR REPLACE FUNCTION refresh_historial_paciente() RETURNS INTEGER AS $$
+DECLARE
+    marca INTEGER;
+    maximo INTEGER;
+    novas INTEGER;
+BEGIN
+    -- Serializa refreshes concorrentes
+    SELECT ultimo_id INTO marca FROM historial_paciente_marca FOR UPDATE;
+    SELECT max(id) INTO maximo FROM consulta WHERE id > marca;
+
+    CREATE TEMPORARY TABLE novas_consultas ON COMMIT DROP AS
+    SELECT c.id, c.ssn, c.nif, c.nome, c.data, c.codigo_sns,
+           m.especialidade,
+           EXTRACT(YEAR FROM age(c.data, p.data_nasc))::SMALLINT AS idade
+    FROM consulta c
+    JOIN medico m ON m.nif = c.nif
+    JOIN paciente p ON p.ssn = c.ssn
+    WHERE c.data < CURRENT_DATE
+    AND c.id IN (
+        SELECT id FROM consulta WHERE id > marca AND id <= maximo
+        UNION ALL
+        SELECT id FROM historial_paciente_pendente
+    );
+
+    INSERT INTO historial_paciente
+    SELECT n.id, n.ssn, n.nif, n.nome, n.data,
+           EXTRACT(YEAR FROM n.data), EXTRACT(MONTH FROM n.data), EXTRACT(DAY FROM n.data),
+           EXTRACT(ISODOW FROM n.data) - 1,
+           n.especialidade, n.idade, 'observacao', o.parametro, o.valor
+    FROM novas_consultas n
+    JOIN observacao o ON o.id = n.id
+    UNION ALL
+    SELECT n.id, n.ssn, n.nif, n.nome, n.data,
+           EXTRACT(YEAR FROM n.data), EXTRACT(MONTH FROM n.data), EXTRACT(DAY FROM n.data),
+           EXTRACT(ISODOW FROM n.data) - 1,
+           n.especialidade, n.idade, 'receita', r.medicamento, r.quantidade
+    FROM novas_consultas n
+    JOIN receita r ON r.codigo_sns = n.codigo_sns
+    ON CONFLICT DO NOTHING;
+    GET DIAGNOSTICS novas = ROW_COUNT;
+
+    -- A marca avança sempre até à última consulta vista; as que ainda estão por realizar ficam
+    -- pendentes, e saem as pendentes já processadas ou canceladas
+    DELETE FROM historial_paciente_pendente p
+    WHERE NOT EXISTS (SELECT 1 FROM consulta c WHERE c.id = p.id AND c.data >= CURRENT_DATE);
+    INSERT INTO historial_paciente_pendente
+    SELECT id FROM consulta WHERE id > marca AND id <= maximo AND data >= CURRENT_DATE;
+    UPDATE historial_paciente_marca
+    SET ultimo_id = COALESCE(maximo, marca),
+        atualizado = LOCALTIMESTAMP;
+
+    DROP TABLE novas_consultas;
+    RETURN novas;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT refresh_historial_paciente();
+ANALYZE historial_paciente;
@@ -0,0 +1,187 @@
+"""Exportação do conjunto de dados gerado em ficheiros colunares (Parquet ou Arrow IPC) e recarga.
+
+populate_v2.py (opção 3) escreve cada tabela em <pasta>/<tabela>.parquet (ou .arrow), com tipos
+(datas, horas, inteiros, valores nulos) em vez de texto; com --workers, as tabelas grandes ficam em
+<tabela>.<k>.parquet, uma parte por processo. O mesmo conjunto pode então ser reutilizado em várias
+execuções dos benchmarks sem voltar a gerá-lo:
+
+    python columnar.py info <pasta>                        # linhas, tamanho e tempo de leitura
+    python columnar.py load <pasta> --database-url "$DATABASE_URL"
+
+Parquet (comprimido com zstd) é o mais compacto; Arrow IPC (sem compressão) é lido com memory map e
+sem cópias, pelo que read_dataset() devolve as tabelas quase instantaneamente, qualquer que seja o
+tamanho. Requer o pacote pyarrow.
+"""
+import argparse
+import datetime
+import glob
+import io
+import os
+import re
+import time
+
+# Column names and types of every table, in foreign-key order (as in populate_v2.TABLES)
+TABLES = {
+    "clinica": [("nome", "text"), ("telefone", "text"), ("morada", "text")],
+    "enfermeiro": [("nif", "text"), ("nome", "text"), ("telefone", "text"), ("morada", "text"), ("nome_clinica", "text")],
+    "medico": [("nif", "text"), ("nome", "text"), ("telefone", "text"), ("morada", "text"), ("especialidade", "text")],
+    "trabalha": [("nif", "text"), ("nome", "text"), ("dia_da_semana", "int16")],
+    "paciente": [("ssn", "text"), ("nif", "text"), ("nome", "text"), ("telefone", "text"), ("morada", "text"), ("data_nasc", "date")],
+    "consulta": [("id", "int32"), ("ssn", "text"), ("nif", "text"), ("nome", "text"), ("data", "date"), ("hora", "time"), ("codigo_sns", "text")],
+    "receita": [("codigo_sns", "text"), ("medicamento", "text"), ("quantidade", "int16")],
+    "observacao": [("id", "int32"), ("parametro", "text"), ("valor", "float")],
+}
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+BATCH_SIZE = 65536
+
+# The generators yield numbers for identifiers and phones, "HH:MM" strings for times and "NULL"
+# for missing values; each column is converted to its type before it is written.
+CONVERT = {
+    "text": str,
+    "int16": int,
+    "int32": int,
+    "float": lambda value: None if value == "NULL" else float(value),
+    "date": lambda value: value,
+    "time": lambda value: value if isinstance(value, datetime.time) else datetime.time.fromisoformat(value),
+}
+
+
+def schema(table):
+    import pyarrow as pa
+
+    types = {"text": pa.string(), "int16": pa.int16(), "int32": pa.int32(), "float": pa.float64(), "date": pa.date32(), "time": pa.time32("s")}
+    return pa.schema([(name, types[kind]) for name, kind in TABLES[table]])
+
+
+def file_name(directory, table, fmt, part=None):
+    return os.path.join(directory, table + ("" if part is None else f".{part}") + FORMATS[fmt])
+
+
+def write_table(path, table, rows, fmt="parquet"):
+    """Escreve as linhas de um gerador em `path`, em lotes de BATCH_SIZE; devolve o número de linhas."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table_schema = schema(table)
+    converters = [CONVERT[kind] for _, kind in TABLES[table]]
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, table_schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, table_schema)
+    count = 0
+    with writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                count += write_batch(writer, table_schema, converters, batch)
+                batch = []
+        count += write_batch(writer, table_schema, converters, batch)
+    return count
+
+
+def write_batch(writer, table_schema, converters, rows):
+    import pyarrow as pa
+
+    columns = zip(*rows) if rows else [()] * len(converters)
+    arrays = [pa.array([convert(value) for value in column], field.type) for convert, column, field in zip(converters, columns, table_schema)]
+    writer.write_batch(pa.record_batch(arrays, schema=table_schema))
+    return len(rows)
+
+
+def table_files(directory, table):
+    """Ficheiros de `table` em `directory`: o único ou as partes, pela ordem dos processos."""
+    pattern = re.compile(rf"{table}(?:\.(\d+))?\.(?:parquet|arrow)$")
+    parts = []
+    for file in glob.glob(os.path.join(glob.escape(directory), f"{table}.*")):
+        match = pattern.match(os.path.basename(file))
+        if match:
+            parts.append((int(match.group(1) or -1), file))
+    return [file for _, file in sorted(parts)]
+
+
+def read_table(path):
+    """Lê um ficheiro; os .arrow são mapeados em memória e lidos sem cópias."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith(".arrow"):
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return pq.read_table(path, memory_map=True)
+
+
+def read_dataset(directory):
+    """Devolve {tabela: pyarrow.Table} com todas as tabelas exportadas em `directory`."""
+    import pyarrow as pa
+
+    dataset = {}
+    for table in TABLES:
+        files = table_files(directory, table)
+        if files:
+            dataset[table] = pa.concat_tables([read_table(file) for file in files])
+    return dataset
+
+
+def copy_table(cur, table, data):
+    """Carrega uma pyarrow.Table com COPY, serializada em CSV pelo próprio Arrow (aspas incluídas)."""
+    import pyarrow.csv as csv
+
+    columns = ", ".join(name for name, _ in TABLES[table])
+    options = csv.WriteOptions(include_header=False, quoting_style="all_valid")
+    with cur.copy(f"COPY {table} ({columns}) FROM STDIN (FORMAT csv)") as copy:
+        for batch in data.to_batches(BATCH_SIZE):
+            buffer = io.BytesIO()
+            csv.write_csv(batch, buffer, options)
+            copy.write(buffer.getvalue())
+    return data.num_rows
+
+
+def load(directory, conninfo):
+    """Carrega numa base de dados vazia (db_init.sql ou partitioning.sql) o conjunto exportado em `directory`."""
+    import psycopg
+    import pyarrow.compute as pc
+
+    dataset = read_dataset(directory)
+    with psycopg.connect(conninfo) as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'consulta'::regclass")
+                partitioned = cur.fetchone()[0]
+                if partitioned and "consulta" in dataset:
+                    limits = pc.min_max(dataset["consulta"]["data"])
+                    cur.execute(
+                        "SELECT criar_particoes_consulta(%s, %s)",
+                        (limits["min"].as_py(), limits["max"].as_py() + datetime.timedelta(days=1)),
+                    )
+                for table, data in dataset.items():
+                    start = time.perf_counter()
+                    copy_table(cur, table, data)
+                    print(f"{table}: {data.num_rows} linhas carregadas em {time.perf_counter() - start:.1f}s.")
+                # consulta.id is SERIAL but the ids are loaded explicitly, so its sequence must be moved past them
+                cur.execute("SELECT setval(pg_get_serial_sequence('consulta', 'id'), (SELECT max(id) FROM consulta))")
+                if partitioned:
+                    # Autovacuum analyzes the partitions but never the partitioned table itself
+                    cur.execute("ANALYZE consulta")
+
+
+def info(directory):
+    start = time.perf_counter()
+    dataset = read_dataset(directory)
+    elapsed = time.perf_counter() - start
+    for table, data in dataset.items():
+        size = sum(os.path.getsize(file) for file in table_files(directory, table))
+        print(f"{table:12} {data.num_rows:>10} linhas {size / 2**20:>10.1f} MiB")
+    print(f"Lido em {elapsed * 1000:.0f} ms.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["info", "load"])
+    parser.add_argument("directory")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    args = parser.parse_args()
+    if args.command == "info":
+        info(args.directory)
+    else:
+        load(args.directory, args.database_url)
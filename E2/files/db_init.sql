@@ -91,7 +91,8 @@ ADD CONSTRAINT self_consulta_check CHECK (is_self_consulta(ssn, nif) = false);
 -- (RI-3)
 CREATE OR REPLACE FUNCTION is_valid_clinic_day(nif character, data date) RETURNS boolean AS $$
 BEGIN
-    RETURN EXISTS (SELECT 1 FROM trabalha WHERE trabalha.nif = is_valid_clinic_day.nif AND dia_da_semana = EXTRACT(DOW FROM data));
+    -- dia_da_semana segue populate_v2.py (0 = segunda-feira, 6 = domingo), i.e. ISODOW - 1
+    RETURN EXISTS (SELECT 1 FROM trabalha WHERE trabalha.nif = is_valid_clinic_day.nif AND dia_da_semana = EXTRACT(ISODOW FROM data) - 1);
 END;
 $$ LANGUAGE plpgsql;
 
@@ -0,0 +1,19 @@
+-- Respostas guardadas por chave de idempotência (cabeçalho Idempotency-Key), para a app com
+-- IDEMPOTENCY_STORE=postgres; executar depois de db_init.sql.
+--
+-- Uma linha com estado NULL é um pedido ainda em curso: expira ao fim de poucos segundos, para que
+-- um worker que morreu a meio não bloqueie a chave. Quando o pedido termina, a linha recebe o código
+-- HTTP e o corpo da resposta e passa a expirar ao fim do TTL. As linhas expiradas podem ser
+-- reaproveitadas pela mesma chave e são apagadas periodicamente pela app (idempotency.py).
+
+DROP TABLE IF EXISTS idempotencia;
+
+CREATE TABLE idempotencia(
+chave VARCHAR(255) PRIMARY KEY,
+impressao CHAR(64) NOT NULL,
+estado SMALLINT,
+corpo BYTEA,
+expira TIMESTAMP NOT NULL
+);
+
+CREATE INDEX idempotencia_expira_idx ON idempotencia (expira);
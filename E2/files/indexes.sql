@@ -0,0 +1,22 @@
+-- Índices para os caminhos de acesso da app (app/queries.py); executar depois de db_init.sql.
+-- db_init.sql só tem chaves primárias e UNIQUE: as consultas por (nif, data, hora) já usam
+-- UNIQUE(nif, data, hora) e as por paciente UNIQUE(ssn, data, hora), o resto faz sequential scans
+-- que crescem com os dois anos de histórico de consulta.
+-- Verificar com app/query_advisor.py (EXPLAIN (ANALYZE, BUFFERS) de cada rota).
+-- Na opção 2 do populate_v2.py (carga com COPY), respondendo "s" a "Adiar a criação de índices e
+-- restrições", são apagados antes da carga e recriados no fim, como os restantes.
+
+-- Especialidades e médicos de uma clínica (LIST_SPECIALTIES, LIST_DOCTORS):
+-- os médicos da clínica e os dias em que lá trabalham saem só do índice
+CREATE INDEX IF NOT EXISTS trabalha_nome_nif_idx ON trabalha (nome, nif) INCLUDE (dia_da_semana);
+
+-- Médicos de uma especialidade (LIST_DOCTORS)
+CREATE INDEX IF NOT EXISTS medico_especialidade_idx ON medico (especialidade, nif) INCLUDE (nome);
+
+-- Servia a carga do antigo índice de horários da app, que já não existe
+DROP INDEX IF EXISTS consulta_data_idx;
+
+-- Observações por parâmetro (estatísticas de um parâmetro ao longo do tempo)
+CREATE INDEX IF NOT EXISTS observacao_parametro_idx ON observacao (parametro) INCLUDE (valor);
+
+ANALYZE trabalha, medico, consulta, observacao;
@@ -0,0 +1,177 @@
+-- Variante do esquema com consulta particionada por mês (RANGE sobre data); executar depois de
+-- db_init.sql e antes de carregar os dados (populate_v2.py cria as partições dos meses que carrega).
+-- As consultas filtradas por data (disponibilidade, marcações, cancelamentos)
+-- só leem as partições dos meses em causa, e os índices de cada mês são pequenos; os meses antigos
+-- podem ser arquivados com ALTER TABLE consulta DETACH PARTITION, juntamente com as suas receitas
+-- e observações.
+--
+-- Num particionamento, as chaves únicas têm de incluir a chave de partição: a chave primária passa
+-- a (id, data) e codigo_sns é único por data. Como as chaves estrangeiras de receita e observacao
+-- precisam de uma chave única só com codigo_sns/id, são substituídas por triggers ao nível do
+-- comando (como em ri_batch.sql). As alterações de id ou codigo_sns não são verificadas.
+
+DROP TABLE IF EXISTS receita CASCADE;
+DROP TABLE IF EXISTS observacao CASCADE;
+DROP TABLE IF EXISTS consulta CASCADE;
+
+CREATE TABLE consulta(
+id SERIAL,
+ssn CHAR(11) NOT NULL REFERENCES paciente,
+nif CHAR(9) NOT NULL REFERENCES medico,
+nome VARCHAR(80) NOT NULL REFERENCES clinica,
+data DATE NOT NULL,
+hora TIME NOT NULL,
+codigo_sns CHAR(12) CHECK (codigo_sns ~ '^[0-9]+$'),
+PRIMARY KEY (id, data),
+UNIQUE(codigo_sns, data),
+UNIQUE(ssn, data, hora),
+UNIQUE(nif, data, hora)
+) PARTITION BY RANGE (data);
+
+-- Recebe as consultas de meses ainda sem partição, para que uma marcação nunca falhe por isso;
+-- criar_particoes_consulta() muda-as para a partição do seu mês quando esta é criada
+CREATE TABLE consulta_default PARTITION OF consulta DEFAULT;
+
+CREATE TABLE receita(
+codigo_sns VARCHAR(12) NOT NULL,
+medicamento VARCHAR(155) NOT NULL,
+quantidade SMALLINT NOT NULL CHECK (quantidade > 0),
+PRIMARY KEY (codigo_sns, medicamento)
+);
+
+CREATE TABLE observacao(
+id INTEGER NOT NULL,
+parametro VARCHAR(155) NOT NULL,
+valor FLOAT,
+PRIMARY KEY (id, parametro)
+);
+
+-- (RI-1), (RI-2) e (RI-3), como em db_init.sql
+ALTER TABLE consulta
+ADD CONSTRAINT consulta_time_check CHECK (
+    (EXTRACT(MINUTE FROM hora) IN (0, 30)) AND
+    ((EXTRACT(HOUR FROM hora) BETWEEN 8 AND 13) OR (EXTRACT(HOUR FROM hora) BETWEEN 14 AND 19))
+);
+
+ALTER TABLE consulta
+ADD CONSTRAINT self_consulta_check CHECK (is_self_consulta(ssn, nif) = false);
+
+ALTER TABLE consulta
+ADD CONSTRAINT clinic_day_check CHECK (is_valid_clinic_day(nif, data) = true);
+
+-- Cria as partições mensais que faltam para cobrir [inicio, fim); devolve quantas criou
+CREATE OR REPLACE FUNCTION criar_particoes_consulta(inicio DATE, fim DATE) RETURNS INTEGER AS $$
+DECLARE
+    mes DATE := date_trunc('month', inicio)::DATE;
+    seguinte DATE;
+    particao TEXT;
+    criadas INTEGER := 0;
+BEGIN
+    -- Serializa chamadas concorrentes (cron, populate_v2.py)
+    PERFORM pg_advisory_xact_lock(hashtext('criar_particoes_consulta'));
+    WHILE mes < fim LOOP
+        seguinte := (mes + INTERVAL '1 month')::DATE;
+        particao := 'consulta_' || to_char(mes, 'YYYY_MM');
+        IF to_regclass(particao) IS NULL THEN
+            -- A partition cannot be created while the default one holds rows of its range:
+            -- move them out first and back in afterwards
+            CREATE TEMPORARY TABLE consulta_mover (LIKE consulta) ON COMMIT DROP;
+            WITH movidas AS (
+                DELETE FROM consulta_default WHERE data >= mes AND data < seguinte RETURNING *
+            )
+            INSERT INTO consulta_mover SELECT * FROM movidas;
+            EXECUTE format('CREATE TABLE %I PARTITION OF consulta FOR VALUES FROM (%L) TO (%L)', particao, mes, seguinte);
+            EXECUTE format('INSERT INTO %I SELECT * FROM consulta_mover', particao);
+            DROP TABLE consulta_mover;
+            criadas := criadas + 1;
+        END IF;
+        mes := seguinte;
+    END LOOP;
+    RETURN criadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partições do mês corrente e dos `meses` seguintes; para correr periodicamente (python partitions.py)
+CREATE OR REPLACE FUNCTION criar_particoes_futuras(meses INTEGER DEFAULT 3) RETURNS INTEGER AS $$
+BEGIN
+    RETURN criar_particoes_consulta(CURRENT_DATE, (date_trunc('month', CURRENT_DATE) + make_interval(months => meses + 1))::DATE);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Chaves estrangeiras de receita e observacao para consulta
+CREATE OR REPLACE FUNCTION check_receita_consulta() RETURNS trigger AS $$
+DECLARE
+    violacao RECORD;
+BEGIN
+    SELECT n.codigo_sns INTO violacao
+    FROM novas n
+    WHERE NOT EXISTS (SELECT 1 FROM consulta c WHERE c.codigo_sns = n.codigo_sns::CHAR(12))
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'Receita da consulta % que não existe', violacao.codigo_sns
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION check_observacao_consulta() RETURNS trigger AS $$
+DECLARE
+    violacao RECORD;
+BEGIN
+    SELECT n.id INTO violacao
+    FROM novas n
+    WHERE NOT EXISTS (SELECT 1 FROM consulta c WHERE c.id = n.id)
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'Observação da consulta % que não existe', violacao.id
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION check_consulta_referencias() RETURNS trigger AS $$
+DECLARE
+    violacao RECORD;
+BEGIN
+    SELECT a.id INTO violacao
+    FROM apagadas a
+    WHERE EXISTS (SELECT 1 FROM observacao o WHERE o.id = a.id)
+    OR EXISTS (SELECT 1 FROM receita r WHERE r.codigo_sns = a.codigo_sns::VARCHAR)
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'A consulta % tem receitas ou observações', violacao.id
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables only allow one event per trigger
+CREATE TRIGGER receita_insert_check
+AFTER INSERT ON receita
+REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION check_receita_consulta();
+
+CREATE TRIGGER receita_update_check
+AFTER UPDATE ON receita
+REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION check_receita_consulta();
+
+CREATE TRIGGER observacao_insert_check
+AFTER INSERT ON observacao
+REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION check_observacao_consulta();
+
+CREATE TRIGGER observacao_update_check
+AFTER UPDATE ON observacao
+REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION check_observacao_consulta();
+
+CREATE TRIGGER consulta_delete_check
+AFTER DELETE ON consulta
+REFERENCING OLD TABLE AS apagadas
+FOR EACH STATEMENT EXECUTE FUNCTION check_consulta_referencias();
+
+SELECT criar_particoes_futuras();
@@ -1,28 +1,45 @@
+import argparse
 import random
 import datetime
+import itertools
 import os
+from concurrent.futures import ProcessPoolExecutor
 import faker
 
 MEDICINE = [['Adderall'], ['Amitriptilina'], ['Amlodipina'], ['Amoxicilina'], ['Ativan'], ['Atorvastatina'], ['Azitromicina'], ['Benzonatato'], ['Botox'], ['Brilinta'], ['Bunavail'], ['Buprenorfina'], ['Cefalexina'], ['Ciprofloxacina'], ['Citalopram'], ['Clindamicina'], ['Clonazepam'], ['Ciclobenzaprina'], ['Cymbalta'], ['Doxiciclina'], ['Dupixente'], ['Entresto'], ['Entívio'], ['Farxiga'], ['Adesivo de Fentanil'], ['Gabapentina'], ['Gemtesa'], ['Humira'], ['Hidroclorotiazida'], ['Ibuprofeno'], ['Imbruvica'], ['Janúvia'], ['Jardiance'], ['Lexapro'], ['Lisinopril'], ['Lofexidina'], ['Loratadina'], ['Lírica'], ['Melatonina'], ['Meloxicam'], ['Metformina'], ['Metadona'], ['Metotrexato'], ['Metoprolol'], ['Mounjaro'], ['Naltrexona'], ['Naproxeno'], ['Narcano'], ['Nurtec'], ['Omeprazol'], ['Opdivo'], ['Otezla'], ['Ozempico'], ['Pantoprazol'], ['Plano B'], ['Prednisona'], ['Probufina'], ['Qulipta'], ['Quviviq'], ['Ribelso'], ['Tepezza'], ['Tramadol'], ['Trazodona'], ['Viagra'], ['Vraylar'], ['Wegovy'], ['Wellbutrin'], ['Xanax'], ['Ervoy'], ['Zubsolv']]
 SPECIALITIES = ["radiologia","ortopedia","cardiologia","neurologia","oncologia"]
 SYMPTOMS = ['Dor de cabeça', 'Náusea', 'Tontura', 'Fadiga', 'Dor no peito', 'Falta de ar', 'Dor abdominal', 'Dor nas costas', 'Febre', 'Tosse', 'Espirros', 'Coriza', 'Dor de garganta', 'Calafrios', 'Suores noturnos', 'Perda de apetite', 'Perda de peso', 'Ganho de peso', 'Vermelhidão nos olhos', 'Coceira', 'Erupção cutânea', 'Inchaço', 'Dor nas articulações', 'Dificuldade para engolir', 'Sensação de queimação ao urinar', 'Urina turva', 'Fezes com sangue', 'Diarreia', 'Constipação', 'Palpitações', 'Ansiedade', 'Depressão', 'Confusão mental', 'Insônia', 'Sonolência excessiva', 'Zumbido nos ouvidos', 'Alterações na visão', 'Sensibilidade à luz', 'Perda de audição', 'Boca seca', 'Perda de olfato', 'Perda de paladar', 'Vômitos', 'Sangramento nasal', 'Hematomas frequentes', 'Sangramento nas gengivas', 'Sensação de formigamento', 'Rigidez muscular', 'Desmaio', 'Dificuldade para respirar à noite']
 METRICS = ['Temperatura corporal (°C)', 'Pressão arterial (mmHg)', 'Frequência cardíaca (bpm)', 'Saturação de oxigênio (%)', 'Frequência respiratória (respirações/min)', 'Glicemia (mg/dL)', 'Nível de colesterol total (mg/dL)', 'Triglicerídeos (mg/dL)', 'Peso corporal (kg)', 'Altura (cm)', 'Índice de Massa Corporal (IMC)', 'Circunferência da cintura (cm)', 'Nível de hemoglobina (g/dL)', 'Contagem de leucócitos (milhões/mm3)', 'Contagem de plaquetas (milhares/mm3)', 'Nível de creatinina (mg/dL)', 'Taxa de filtração glomerular (TFG)', 'Bilirrubina total (mg/dL)', 'Nível de albumina (g/dL)', 'Tempo de protrombina (segundos)']
-MAX_CLINICS = 5
-MAX_PATIENTS = 5000
+# SCALE (--scale) multiplica clínicas, médicos e pacientes mantendo as proporções (e.g. consultas por
+# paciente); o tempo de geração cresce linearmente com SCALE e com o número de dias (DAYS)
+SCALE = 1
+MAX_CLINICS = 5 * SCALE
+MAX_PATIENTS = 5000 * SCALE
 MAX_NURSES = 6
-MAX_MEDICS = 60
-
-nifs = [i + 100000000 for i in range(5090)]
-phones = [i + 910000000 for i in range(5095)]
-snss = [i + 10000000000 for i in range(5090)]
+MAX_MEDICS = 60 * SCALE
+
+def set_scale(scale):
+    """Fixa SCALE e os tamanhos das tabelas que dependem dele."""
+    global SCALE, MAX_CLINICS, MAX_PATIENTS, MAX_MEDICS
+    SCALE = scale
+    MAX_CLINICS = 5 * SCALE
+    MAX_PATIENTS = 5000 * SCALE
+    MAX_MEDICS = 60 * SCALE
+
+# Geradores sequenciais de identificadores: next() é O(1), ao contrário de list.pop(0)
+nifs = itertools.count(100000000)
+phones = itertools.count(910000000)
+snss = itertools.count(10000000000)
+# Só as tabelas pequenas referenciadas por outras ficam em memória (e dos pacientes apenas o ssn);
+# as restantes são geradas linha a linha diretamente para o destino (CSV, SQL ou COPY)
 clinics = []
-nurses = []
 medics = []
-patients = []
 works = []
-appointments = []
-prescriptions = []
-observations = []
+patients = []
+
+# Semente das consultas: gen_appointments pode ser percorrido várias vezes (para as receitas e
+# observações) e produz sempre as mesmas linhas; --seed fixa-a (e às restantes tabelas)
+SEED = random.randrange(2**32)
 
 fake = faker.Faker("pt_PT")
 
@@ -54,17 +71,17 @@ def get_random_last_name():
 # morada (varchar(255) NOT NULL)
 
 def gen_clinics():
+    if FAST_IDENTITIES:
+        yield from gen_clinics_fast()
+        return
     for i in range(MAX_CLINICS):
         clinic = []
         name = "Clinica "+ get_random_last_name()
         clinic.append(name)
-        clinic.append(phones.pop(0))
+        clinic.append(next(phones))
         clinic.append(get_random_address())
         clinics.append(clinic)
-    with open("clinica.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("nome, telefone, morada\n")
-        for i in clinics:
-            csvfile.write(f"{i[0]}, {i[1]}, {i[2]}\n")
+        yield clinic
 
 # enfermeiro:
 # nif (char(9) PRIMARY KEY)
@@ -74,20 +91,18 @@ def gen_clinics():
 # nome_clinica (varchar(80) NOT NULL references clinica(nome))
 
 def gen_nurses():
+    if FAST_IDENTITIES:
+        yield from gen_nurses_fast()
+        return
     for i in range(MAX_NURSES):
         for j in range(MAX_CLINICS):
             nurse = []
-            nurse.append(nifs.pop(0))
+            nurse.append(next(nifs))
             nurse.append(get_random_name())
-            nurse.append(phones.pop(0))
+            nurse.append(next(phones))
             nurse.append(get_random_address())
             nurse.append(clinics[j][0])
-            nurses.append(nurse)
-            
-    with open("enfermeiro.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("nif, nome, telefone, morada, nome_clinica\n")
-        for i in nurses:
-            csvfile.write(f"{i[0]}, {i[1]}, {i[2]}, {i[3]}, {i[4]}\n")
+            yield nurse
 
 # medico:
 # nif (char(9) PRIMARY KEY)
@@ -99,21 +114,21 @@ def gen_nurses():
 # especialidades diferentes
 
 def gen_medics():
+    if FAST_IDENTITIES:
+        yield from gen_medics_fast()
+        return
     for i in range(MAX_MEDICS):
         medic = []
-        medic.append(nifs.pop(0))
+        medic.append(next(nifs))
         medic.append(get_random_name())
-        medic.append(phones.pop(0))
+        medic.append(next(phones))
         medic.append(get_random_address())
-        if i < 20:
+        if i < 20 * SCALE:
             medic.append("clínica geral")
         else:
             medic.append(random.choice(SPECIALITIES))
         medics.append(medic)
-    with open("medico.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("nif, nome, telefone, morada, especialidade\n")
-        for i in medics:
-            csvfile.write(f"{i[0]}, {i[1]}, {i[2]}, {i[3]}, {i[4]}\n")
+        yield medic
 
 # trabalha:
 # nif (char(9) NOT NULL references medico(nif))
@@ -134,13 +149,8 @@ def gen_works():
             work.append(medic[0])
             work.append(clinic[0])
             work.append(day)
-            works.append(work)        
-            
-    # Write to file
-    with open("trabalha.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("nif, nome, dia_da_semana\n")
-        for work in works:
-            csvfile.write(f"{work[0]}, {work[1]}, {work[2]}\n")
+            works.append(work)
+            yield work
 
 def read_trabalha():
     trabalha = []
@@ -161,19 +171,19 @@ def read_trabalha():
 # data_nasc DATE NOT NULL
 
 def gen_patients():
+    if FAST_IDENTITIES:
+        yield from gen_patients_fast()
+        return
     for i in range(MAX_PATIENTS):
         patient = []
-        patient.append(snss.pop(0))
-        patient.append(nifs.pop(0))
+        patient.append(next(snss))
+        patient.append(next(nifs))
         patient.append(get_random_name())
-        patient.append(phones.pop(0))
+        patient.append(next(phones))
         patient.append(get_random_address())
         patient.append(fake.date_of_birth(minimum_age=18, maximum_age=92))
-        patients.append(patient)
-    with open("paciente.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("ssn, nif, nome, telefone, morada, data_nasc\n")
-        for i in patients:
-            csvfile.write(f"{i[0]}, {i[1]}, {i[2]}, {i[3]}, {i[4]}, {i[5]}\n")
+        patients.append(patient[0])
+        yield patient
 
 # consulta:
 # id SERIAL PRIMARY KEY
@@ -211,56 +221,42 @@ def generate_times():
 
 from datetime import *
 
-def gen_appointments():
-    codigo_sns = 100000000000
-    id_counter = 1
-    first_day = datetime(2023, 1, 1)
+FIRST_DAY = datetime(2023, 1, 1)
+DAYS = 731
+
+# Os dias [start, start + days) podem ser gerados de forma independente (ver plan_shards):
+# first_id é o id da primeira consulta do intervalo e seed a semente própria do intervalo
+
+def gen_appointments(start=0, days=DAYS, first_id=1, seed=None):
+    seed = SEED if seed is None else seed
+    rng = random.Random(seed)
+    codigo_sns = 100000000000 + first_id - 1
+    id_counter = first_id
     times = generate_times()
-    
-    for i in range(731):
-        patients_temp = patients.copy()
-        day = first_day + timedelta(days=i)
-        for work in works:
-            if work[2] == day.weekday(): # x % 7 = (0-6) -> 0 = segunda, 6 = domingo
-                times_temp = times.copy()
-                for _ in range(3):
-                    appointment = []
-                    appointment.append(id_counter)
-                    patient = random.choice(patients_temp)
-                    patients_temp.remove(patient)
-                    appointment.append(patient[0])
-                    appointment.append(work[0])
-                    appointment.append(work[1])
-                    appointment.append(day.date())
-                    time = random.choice(times_temp)
-                    times_temp.remove(time)
-                    appointment.append(time)
-                    appointment.append(codigo_sns)
-                    appointments.append(appointment)
-                    id_counter += 1
-                    codigo_sns += 1
-
-    seen = set()
-    appointments_no_duplicates = []
-
-    for appointment in appointments:
-        
-        key_nif = (appointment[1], appointment[4], appointment[5])
-        key_ssn = (appointment[2], appointment[4], appointment[5])
-        
-        if key_nif not in seen and key_ssn not in seen:
-            appointments_no_duplicates.append(appointment)
-            seen.add(key_nif)
-            seen.add(key_ssn)
-
-    appointments.clear()
-    for i in appointments_no_duplicates:
-        appointments.append(i)
-                
-    with open("consulta.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("id, ssn, nif, nome, data, hora, codigo_sns\n")
-        for appointment in appointments_no_duplicates:
-            csvfile.write(f"{appointment[0]}, {appointment[1]}, {appointment[2]}, {appointment[3]}, {appointment[4]}, {appointment[5]}, {appointment[6]}\n")
+    works_by_weekday = [[] for _ in range(7)]
+    for work in works:
+        works_by_weekday[work[2]].append(work) # x % 7 = (0-6) -> 0 = segunda, 6 = domingo
+
+    for i in range(start, start + days):
+        day = FIRST_DAY + timedelta(days=i)
+        day_works = works_by_weekday[day.weekday()]
+        # Sampling without replacement guarantees UNIQUE(ssn, data, hora) (each patient at most once a day)
+        # and UNIQUE(nif, data, hora) (a doctor works at one clinic per weekday, at distinct times),
+        # and random.sample costs O(k) rather than copying the whole population
+        day_patients = iter(rng.sample(patients, 3 * len(day_works)))
+        for work in day_works:
+            for time in rng.sample(times, 3):
+                appointment = []
+                appointment.append(id_counter)
+                appointment.append(next(day_patients))
+                appointment.append(work[0])
+                appointment.append(work[1])
+                appointment.append(day.date())
+                appointment.append(time)
+                appointment.append(codigo_sns)
+                id_counter += 1
+                codigo_sns += 1
+                yield appointment
 
 # receita:
 # codigo_sns VARCHAR(12)
@@ -272,28 +268,28 @@ def gen_appointments():
 # quantidades entre 1 e 3
 limit_date = datetime(2024, 5, 30).date()
 
-def gen_prescriptions():
-    for appointment in appointments:
+def gen_prescriptions(start=0, days=DAYS, first_id=1, seed=None):
+    seed = SEED if seed is None else seed
+    if USE_NUMPY:
+        yield from gen_prescriptions_np(start, days, first_id, seed)
+        return
+    rng = random.Random(f"{seed}-receita")
+    for appointment in gen_appointments(start, days, first_id, seed):
         date = appointment[4]
         
         if date > limit_date:
             break
         
-        if random.random() < 0.8:
+        if rng.random() < 0.8:
             medicine = ""
             prescription = []
             prescription.append(appointment[6])
-            for _ in range(random.randint(1, 6)):
-                medicine += random.choice(MEDICINE)[0] + " "
+            for _ in range(rng.randint(1, 6)):
+                medicine += rng.choice(MEDICINE)[0] + " "
             medicine.strip()
             prescription.append(medicine)
-            prescription.append(random.randint(1, 3))
-            prescriptions.append(prescription)
-                
-    with open("receita.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("codigo_sns, medicamento, quantidade\n")
-        for prescription in prescriptions:
-            csvfile.write(f"{prescription[0]}, {prescription[1]}, {prescription[2]}\n")
+            prescription.append(rng.randint(1, 3))
+            yield prescription
 
 # observacao:
 # id INTEGER NOT NULL references consulta(id)
@@ -303,100 +299,489 @@ def gen_prescriptions():
 # observações de sintomas (com parâmetro mas sem valor ("NULL")) e 0 a 3
 # observações métricas (com parâmetro e valor).
 
-def gen_observations():
-    for appointment in appointments:
+def gen_observations(start=0, days=DAYS, first_id=1, seed=None):
+    seed = SEED if seed is None else seed
+    if USE_NUMPY:
+        yield from gen_observations_np(start, days, first_id, seed)
+        return
+    rng = random.Random(f"{seed}-observacao")
+    for appointment in gen_appointments(start, days, first_id, seed):
         date = appointment[4]
         if date > limit_date:
             break
         app_sypmtoms = []
-        for _ in range(random.randint(1, 5)):
+        for _ in range(rng.randint(1, 5)):
             observation = []
             observation.append(appointment[0])
-            symptom = random.choice(SYMPTOMS)
+            symptom = rng.choice(SYMPTOMS)
             while symptom in app_sypmtoms:
-                symptom = random.choice(SYMPTOMS) 
+                symptom = rng.choice(SYMPTOMS) 
             app_sypmtoms.append(symptom)
             observation.append(symptom)
             observation.append("NULL")
-            observations.append(observation)
-        for _ in range(random.randint(0, 3)):
+            yield observation
+        for _ in range(rng.randint(0, 3)):
             observation = []
             observation.append(appointment[0])
-            symptom = random.choice(METRICS)
+            symptom = rng.choice(METRICS)
             while symptom in app_sypmtoms:
-                symptom = random.choice(METRICS)
+                symptom = rng.choice(METRICS)
             app_sypmtoms.append(symptom)
             observation.append(symptom)
-            observation.append(random.uniform(0, 100))
-            observations.append(observation)
+            observation.append(rng.uniform(0, 100))
+            yield observation
+
+# Modo NumPy (--numpy): receitas e observações são sorteadas em blocos de NUMPY_CHUNK consultas
+# com operações vetoriais, em vez de um ciclo Python por consulta. Como os ids das consultas são
+# contíguos (ver count_appointments), não é preciso gerar as consultas para os conhecer.
+USE_NUMPY = False
+NUMPY_CHUNK = 100000
+PARAMETERS = SYMPTOMS + METRICS
+
+def numpy_chunks(start, days, first_id, seed, table):
+    import numpy as np
+
+    rng = np.random.default_rng(random.Random(f"{seed}-{table}").getrandbits(64))
+    last_id = first_id + count_appointments(start, days, until=limit_date)
+    for chunk_start in range(first_id, last_id, NUMPY_CHUNK):
+        yield rng, np.arange(chunk_start, min(chunk_start + NUMPY_CHUNK, last_id))
+
+def gen_prescriptions_np(start, days, first_id, seed):
+    import numpy as np
+
+    names = [medicine[0] + " " for medicine in MEDICINE]
+    for rng, ids in numpy_chunks(start, days, first_id, seed, "receita"):
+        n = len(ids)
+        keep = rng.random(n) < 0.8
+        counts = rng.integers(1, 7, n)
+        picks = rng.integers(0, len(MEDICINE), (n, 6))
+        quantities = rng.integers(1, 4, n)
+        for i in np.flatnonzero(keep).tolist():
+            medicine = "".join(names[m] for m in picks[i, :counts[i]].tolist())
+            yield [100000000000 + int(ids[i]) - 1, medicine, int(quantities[i])]
+
+def gen_observations_np(start, days, first_id, seed):
+    import numpy as np
+
+    for rng, ids in numpy_chunks(start, days, first_id, seed, "observacao"):
+        n = len(ids)
+        # Sorting a row of random keys gives a permutation, i.e. parameters without replacement per row
+        symptoms = rng.random((n, len(SYMPTOMS))).argsort(axis=1)[:, :5]
+        metrics = len(SYMPTOMS) + rng.random((n, len(METRICS))).argsort(axis=1)[:, :3]
+        params = np.hstack([symptoms, metrics])
+        values = np.hstack([np.full((n, 5), np.nan), rng.uniform(0, 100, (n, 3))])
+        mask = np.hstack([
+            np.arange(5) < rng.integers(1, 6, n)[:, None],
+            np.arange(3) < rng.integers(0, 4, n)[:, None],
+        ])
+        rows = zip(np.broadcast_to(ids[:, None], mask.shape)[mask].tolist(), params[mask].tolist(), values[mask].tolist())
+        for id, param, value in rows:
+            yield [id, PARAMETERS[param], "NULL" if value != value else value]
+
+# Modo rápido de identidades (--fast-identities): em vez de chamar o Faker em cada linha, tira-se
+# do Faker, uma única vez, um conjunto limitado de nomes próprios, apelidos, cidades, ruas e códigos
+# postais, e cada nome ou morada é uma combinação sorteada com NumPy, em blocos de NUMPY_CHUNK linhas.
+# Os nomes de médicos e enfermeiros e os nomes e moradas das clínicas são combinações sorteadas sem
+# repetição; o resultado só depende da semente (SEED).
+FAST_IDENTITIES = False
+IDENTITY_SAMPLES = 2000
+identity_pools = {}
+
+def get_identity_pools():
+    """Listas de nomes próprios, apelidos, cidades, ruas e códigos postais, tiradas do Faker com a SEED."""
+    if not identity_pools:
+        pool_fake = faker.Faker("pt_PT")
+        pool_fake.seed_instance(SEED)
+        # Bounded so that any combination fits nome VARCHAR(80) and morada VARCHAR(255)
+        for pool, method, limit in (("first", "first_name", 25), ("last", "last_name", 25), ("city", "city", 60), ("street", "street_name", 120), ("postcode", "postcode", 10)):
+            values = {getattr(pool_fake, method)().replace("'", "") for _ in range(IDENTITY_SAMPLES)}
+            identity_pools[pool] = sorted(value for value in values if len(value) <= limit)
+    return identity_pools
+
+def identity_rng(table):
+    import numpy as np
+
+    return np.random.default_rng(random.Random(f"{SEED}-{table}").getrandbits(64))
+
+def draw_unique(rng, sizes, n):
+    """`n` combinações distintas de índices, uma por linha, de um espaço com as dimensões `sizes`."""
+    import numpy as np
+
+    space = 1
+    for size in sizes:
+        space *= size
+    if n > space:
+        raise ValueError(f"Só há {space} combinações distintas para {n} linhas.")
+    return np.stack(np.unravel_index(rng.choice(space, n, replace=False), sizes), axis=1).tolist()
+
+def fast_names(rng, n, unique=False):
+    pools = get_identity_pools()
+    first, last = pools["first"], pools["last"]
+    if not unique:
+        return [f"{first[i]} {last[j]}" for i, j in zip(rng.integers(0, len(first), n).tolist(), rng.integers(0, len(last), n).tolist())]
+    # Two surnames, as in Portuguese names, when first name + surname run out of combinations
+    if n <= len(first) * len(last):
+        return [f"{first[i]} {last[j]}" for i, j in draw_unique(rng, (len(first), len(last)), n)]
+    return [f"{first[i]} {last[j]} {last[k]}" for i, j, k in draw_unique(rng, (len(first), len(last), len(last)), n)]
+
+def fast_addresses(rng, n, unique=False):
+    pools = get_identity_pools()
+    city, street, postcode = pools["city"], pools["street"], pools["postcode"]
+    if unique:
+        indexes = draw_unique(rng, (len(city), len(street), 999), n)
+    else:
+        indexes = zip(rng.integers(0, len(city), n).tolist(), rng.integers(0, len(street), n).tolist(), rng.integers(0, 999, n).tolist())
+    codes = rng.integers(0, len(postcode), n).tolist()
+    return [f"{city[i]} {street[j]} {number + 1} {postcode[code]}" for (i, j, number), code in zip(indexes, codes)]
+
+def gen_clinics_fast():
+    rng = identity_rng("clinica")
+    last = get_identity_pools()["last"]
+    if MAX_CLINICS <= len(last):
+        names = [f"Clinica {last[i]}" for i, in draw_unique(rng, (len(last),), MAX_CLINICS)]
+    else:
+        names = [f"Clinica {last[i]} {last[j]}" for i, j in draw_unique(rng, (len(last), len(last)), MAX_CLINICS)]
+    for name, address in zip(names, fast_addresses(rng, MAX_CLINICS, unique=True)):
+        clinic = [name, next(phones), address]
+        clinics.append(clinic)
+        yield clinic
 
-    with open("observacao.csv","w", encoding='utf-8') as csvfile:
-        csvfile.write("id, parametro, valor\n")
-        for observation in observations:
-            csvfile.write(f"{observation[0]}, {observation[1]}, {observation[2]}\n")
+def gen_nurses_fast():
+    rng = identity_rng("enfermeiro")
+    n = MAX_NURSES * MAX_CLINICS
+    rows = zip(fast_names(rng, n, unique=True), fast_addresses(rng, n))
+    for i in range(MAX_NURSES):
+        for j in range(MAX_CLINICS):
+            name, address = next(rows)
+            yield [next(nifs), name, next(phones), address, clinics[j][0]]
+
+def gen_medics_fast():
+    rng = identity_rng("medico")
+    specialties = rng.integers(0, len(SPECIALITIES), MAX_MEDICS).tolist()
+    rows = zip(fast_names(rng, MAX_MEDICS, unique=True), fast_addresses(rng, MAX_MEDICS), specialties)
+    for i, (name, address, specialty) in enumerate(rows):
+        medic = [next(nifs), name, next(phones), address, "clínica geral" if i < 20 * SCALE else SPECIALITIES[specialty]]
+        medics.append(medic)
+        yield medic
+
+def gen_patients_fast():
+    import numpy as np
+
+    rng = identity_rng("paciente")
+    # Born 18 to 92 years before the first appointment, so the output does not depend on today's date
+    oldest = np.datetime64(FIRST_DAY.date().replace(year=FIRST_DAY.year - 92))
+    youngest = np.datetime64(FIRST_DAY.date().replace(year=FIRST_DAY.year - 18))
+    for chunk_start in range(0, MAX_PATIENTS, NUMPY_CHUNK):
+        n = min(NUMPY_CHUNK, MAX_PATIENTS - chunk_start)
+        births = (oldest + rng.integers(0, (youngest - oldest).astype(int), n)).tolist()
+        for name, address, birth in zip(fast_names(rng, n), fast_addresses(rng, n), births):
+            patient = [next(snss), next(nifs), name, next(phones), address, birth]
+            patients.append(patient[0])
+            yield patient
+
+# Ordem das tabelas respeita as chaves estrangeiras: cada tabela só referencia tabelas anteriores
+# (e os geradores de cada tabela dependem das listas preenchidas pelos anteriores)
+TABLES = [
+    ("clinica.csv", "Clinica", "(nome, telefone, morada)", gen_clinics),
+    ("enfermeiro.csv", "Enfermeiro", "(nif, nome, telefone, morada, nome_clinica)", gen_nurses),
+    ("medico.csv", "Medico", "(nif, nome, telefone, morada, especialidade)", gen_medics),
+    ("trabalha.csv", "Trabalha", "(nif, nome, dia_da_semana)", gen_works),
+    ("paciente.csv", "Paciente", "(ssn, nif, nome, telefone, morada, data_nasc)", gen_patients),
+    ("consulta.csv", "Consulta", "(id, ssn, nif, nome, data, hora, codigo_sns)", gen_appointments),
+    ("receita.csv", "Receita", "(codigo_sns, medicamento, quantidade)", gen_prescriptions),
+    ("observacao.csv", "Observacao", "(id, parametro, valor)", gen_observations),
+]
+
+# Tabelas geradas por intervalos de datas quando há vários processos (--workers)
+SHARDED = ("Consulta", "Receita", "Observacao")
+
+def count_appointments(start, days, until=None):
+    """Número de consultas que gen_appointments(start, days) gera (até à data `until`, se indicada)."""
+    # gen_appointments gera exatamente 3 consultas por médico que trabalha nesse dia da semana,
+    # por isso os ids (e codigo_sns) de cada intervalo são conhecidos sem gerar as consultas
+    per_weekday = [0] * 7
+    for work in works:
+        per_weekday[work[2]] += 3
+    count = 0
+    for d in range(start, start + days):
+        day = FIRST_DAY + timedelta(days=d)
+        if until is not None and day.date() > until:
+            break
+        count += per_weekday[day.weekday()]
+    return count
+
+def plan_shards(workers):
+    """Divide os DAYS dias em `workers` intervalos, cada um com o seu bloco de ids e a sua semente."""
+    size = -(-DAYS // workers)
+    shards = []
+    first_id = 1
+    for k, start in enumerate(range(0, DAYS, size)):
+        days = min(size, DAYS - start)
+        shards.append((start, days, first_id, f"{SEED}-{k}"))
+        first_id += count_appointments(start, days)
+    return shards
+
+def shard_file(file, k):
+    return file.replace(".csv", f".{k}.csv")
+
+def run_shard(k, shard, works_, patients_, conninfo=None, use_numpy=False, export=None, scale=1):
+    # Each process receives its state explicitly so this also works with the spawn start method
+    global USE_NUMPY
+    works[:] = works_
+    patients[:] = patients_
+    USE_NUMPY = use_numpy
+    set_scale(scale)
+    counts = {}
+    if conninfo:
+        import psycopg
+
+        with psycopg.connect(conninfo) as conn:
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    for _, table, column, gen in TABLES:
+                        if table in SHARDED:
+                            counts[table] = copy_rows(cur, table, column, gen(*shard))
+    elif export:
+        import columnar
+
+        directory, fmt = export
+        for _, table, _, gen in TABLES:
+            if table in SHARDED:
+                counts[table] = columnar.write_table(columnar.file_name(directory, table.lower(), fmt, k), table.lower(), gen(*shard), fmt)
+    else:
+        for file, table, column, gen in TABLES:
+            if table in SHARDED:
+                counts[table] = write_csv(shard_file(file, k), column, gen(*shard))
+    return counts
+
+def run_shards(workers, conninfo=None, export=None):
+    shards = plan_shards(workers)
+    totals = dict.fromkeys(SHARDED, 0)
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(run_shard, k, shard, works, patients, conninfo, USE_NUMPY, export, SCALE) for k, shard in enumerate(shards)]
+        for future in futures:
+            for table, count in future.result().items():
+                totals[table] += count
+    return shards, totals
+
+def merge_csv(file, shards):
+    with open(file, "w", encoding='utf-8') as csvfile:
+        for k in range(len(shards)):
+            with open(shard_file(file, k), "r", encoding='utf-8') as part:
+                header = next(part)
+                if k == 0:
+                    csvfile.write(header)
+                for row in part:
+                    csvfile.write(row)
+            os.remove(shard_file(file, k))
+
+# Destinos: cada um consome as linhas de um gerador à medida que são produzidas e
+# devolve o número de linhas escritas
+
+def write_csv(file, column, rows):
+    count = 0
+    with open(file, "w", encoding='utf-8') as csvfile:
+        csvfile.write(column.strip("()") + "\n")
+        for row in rows:
+            csvfile.write(", ".join(str(x) for x in row) + "\n")
+            count += 1
+    return count
+
+def read_csv(file):
+    with open(file, "r", encoding='utf-8') as csvfile:
+        next(csvfile)  # Skip the header
+        for row in csvfile:
+            yield [x.strip() for x in row.split(",")]
+
+def write_sql(sqlfile, table, column, rows):
+    count = 0
+    for row in rows:
+        values = ",".join([f"'{x}'" if x != "NULL" else "NULL" for x in map(str, row)])
+        if count == 0:
+            sqlfile.write(f"INSERT INTO {table} {column} VALUES\n({values})")
+        else:
+            sqlfile.write(f",\n({values})")
+        count += 1
+    if count:
+        sqlfile.write(";\n")  # Last row with semicolon
+    sqlfile.write("\n")  # Add a newline between different tables
+    return count
+
+def copy_rows(cur, table, column, rows):
+    count = 0
+    with cur.copy(f"COPY {table} {column} FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row([None if value == "NULL" else value for value in row])
+            count += 1
+    return count
+
+def gen_csv(workers=1):
+    for file, table, column, gen in TABLES:
+        if workers > 1 and table in SHARDED:
+            continue
+        count = write_csv(file, column, gen())
+        print(f"{table} criada com sucesso! ({count} linhas)")
+    if workers > 1:
+        shards, totals = run_shards(workers)
+        for file, table, _, _ in TABLES:
+            if table in SHARDED:
+                merge_csv(file, shards)
+                print(f"{table} criada com sucesso! ({totals[table]} linhas, {len(shards)} partes)")
+
+# Exportação colunar (ver columnar.py): cada tabela num ficheiro Parquet ou Arrow com tipos, que
+# columnar.py volta a ler (com memory map) ou a carregar no Postgres sem gerar os dados de novo
+def gen_columnar(directory, fmt="parquet", workers=1):
+    import columnar
+
+    os.makedirs(directory, exist_ok=True)
+    for _, table, _, gen in TABLES:
+        if workers > 1 and table in SHARDED:
+            continue
+        count = columnar.write_table(columnar.file_name(directory, table.lower(), fmt), table.lower(), gen(), fmt)
+        print(f"{table} exportada com sucesso! ({count} linhas)")
+    if workers > 1:
+        shards, totals = run_shards(workers, export=(directory, fmt))
+        for table in SHARDED:
+            print(f"{table} exportada com sucesso! ({totals[table]} linhas, {len(shards)} partes)")
 
 def csv_to_sql():
     with open("database.sql", "w", encoding='utf-8') as sqlfile:
-        files = ["clinica.csv", "enfermeiro.csv", "medico.csv", "trabalha.csv", "paciente.csv", "consulta.csv", "receita.csv", "observacao.csv"]
-        tables = ["Clinica", "Enfermeiro", "Medico", "Trabalha", "Paciente", "Consulta", "Receita", "Observacao"]
-        columns = [
-            "(nome, telefone, morada)",
-            "(nif, nome, telefone, morada, nome_clinica)",
-            "(nif, nome, telefone, morada, especialidade)",
-            "(nif, nome, dia_da_semana)",
-            "(ssn, nif, nome, telefone, morada, data_nasc)",
-            "(id, ssn, nif, nome, data, hora, codigo_sns)",
-            "(codigo_sns, medicamento, quantidade)",
-            "(id, parametro, valor)"
-        ]
-
-        for file, table, column in zip(files, tables, columns):
-            with open(file, "r", encoding='utf-8') as csvfile:
-                sqlfile.write(f"INSERT INTO {table} {column} VALUES\n")
-                rows = csvfile.readlines()[1:]  # Skip the header
-                for row in rows[:-1]:
-                    values = ",".join([f"'{x.strip()}'" if x.strip() != "NULL" else "NULL" for x in row.split(",")])
-                    sqlfile.write(f"({values}),\n")
-                values = ",".join([f"'{x.strip()}'" if x.strip() != "NULL" else "NULL" for x in rows[-1].split(",")])
-                sqlfile.write(f"({values});\n")  # Last row with semicolon
-            sqlfile.write("\n")  # Add a newline between different tables
-            
+        for file, table, column, _ in TABLES:
+            write_sql(sqlfile, table, column, read_csv(file))
+
+# Carregamento direto com COPY FROM STDIN: as linhas geradas vão diretamente para o Postgres,
+# sem passar por um script SQL que o servidor teria de analisar.
+# Com defer=True as restrições (exceto chaves primárias) e os índices secundários são removidos
+# antes da carga e recriados no fim, validando cada tabela de uma só vez.
+def drop_deferred(cur, tables):
+    cur.execute("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = ANY(%s::regclass[]) AND contype IN ('f', 'u', 'c')
+        ORDER BY CASE contype WHEN 'f' THEN 0 ELSE 1 END
+    """, (tables,))
+    constraints = cur.fetchall()
+    cur.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::regclass[]) AND NOT i.indisprimary
+        AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+    """, (tables,))
+    indexes = cur.fetchall()
+    for table, name, _ in constraints:
+        cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+    for name, _ in indexes:
+        cur.execute(f"DROP INDEX {name}")
+    return constraints, indexes
+
+def restore_deferred(cur, constraints, indexes):
+    for _, definition in indexes:
+        cur.execute(definition)
+    # Foreign keys were fetched first; recreate them last, after the unique keys they reference
+    for table, name, definition in reversed(constraints):
+        cur.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+
+def sync_sequences(cur):
+    # consulta.id is SERIAL but the ids are loaded explicitly, so its sequence must be moved past them
+    cur.execute("SELECT setval(pg_get_serial_sequence('consulta', 'id'), (SELECT max(id) FROM consulta))")
+
+def create_partitions(cur):
+    # With the partitioned schema (partitioning.sql) every month being loaded gets its partition
+    # up front, so COPY routes each row straight to its month instead of the default partition
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = 'consulta'::regclass")
+    if not cur.fetchone()[0]:
+        return False
+    last_day = FIRST_DAY + timedelta(days=DAYS)
+    cur.execute("SELECT criar_particoes_consulta(%s, %s)", (FIRST_DAY.date(), last_day.date()))
+    print(f"Consulta: {cur.fetchone()[0]} partições mensais criadas.")
+    return True
+
+def finish_load(cur, deferred, partitioned):
+    if deferred is not None:
+        restore_deferred(cur, *deferred)
+    sync_sequences(cur)
+    if partitioned:
+        # Autovacuum analyzes the partitions but never the partitioned table itself
+        cur.execute("ANALYZE consulta")
+
+def copy_to_db(conninfo, defer=False, workers=1):
+    import psycopg
+
+    # With several workers the big tables are loaded in parallel, one transaction per shard,
+    # so the small tables have to be committed first
+    with psycopg.connect(conninfo) as conn:
+        with conn.transaction():
+            with conn.cursor() as cur:
+                deferred = None
+                if defer:
+                    deferred = drop_deferred(cur, [table.lower() for _, table, _, _ in TABLES])
+                partitioned = create_partitions(cur)
+                for _, table, column, gen in TABLES:
+                    if workers > 1 and table in SHARDED:
+                        continue
+                    count = copy_rows(cur, table, column, gen())
+                    print(f"{table}: {count} linhas carregadas.")
+                if workers == 1:
+                    finish_load(cur, deferred, partitioned)
+        if workers > 1:
+            _, totals = run_shards(workers, conninfo)
+            for table in SHARDED:
+                print(f"{table}: {totals[table]} linhas carregadas.")
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    finish_load(cur, deferred, partitioned)
+
+def remove_csv():
+    for file, _, _, _ in TABLES:
+        os.remove(file)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1, help="processos para gerar consultas, receitas e observações")
+    parser.add_argument("--numpy", action="store_true", help="gerar receitas e observações com NumPy")
+    parser.add_argument("--fast-identities", action="store_true", help="gerar nomes e moradas sem chamar o Faker em cada linha (requer NumPy)")
+    parser.add_argument("--seed", type=int, help="semente, para gerar sempre os mesmos dados")
+    parser.add_argument("--scale", type=int, default=1, help="multiplica o número de clínicas, médicos e pacientes")
+    args = parser.parse_args()
+    if args.scale < 1:
+        parser.error("--scale tem de ser pelo menos 1")
+    set_scale(args.scale)
+    USE_NUMPY = args.numpy
+    FAST_IDENTITIES = args.fast_identities
+    if args.seed is not None:
+        SEED = args.seed
+        random.seed(SEED)
+        fake.seed_instance(SEED)
+
     while(True):
         print("Selecione a opção que deseja executar:")
         print("1 - Criar ficheiro SQL")
+        print("2 - Carregar diretamente na base de dados (COPY)")
+        print("3 - Exportar em formato colunar (Parquet ou Arrow)")
         print("q - Sair")
         input_option = input()
 
         if input_option == "1":
-            gen_clinics()
-            print("Clínicas criadas com sucesso!")
-            gen_nurses()
-            print("Enfermeiros criados com sucesso!")
-            gen_medics()
-            print("Médicos criados com sucesso!")
-            gen_works()
-            print("Trabalha criado com sucesso!")
-            gen_patients()
-            print("Pacientes criados com sucesso!")
-            gen_appointments()
-            print("Consultas criadas com sucesso!")
-            gen_prescriptions()
-            print("Receitas criadas com sucesso!")
-            gen_observations()
-            print("Observações criadas com sucesso!")
+            gen_csv(args.workers)
             delete_csv = input("Se quiser realizar alguma mudança nos ficheiros CSV, faça-o agora.\nDepois de terminar, pressione 'Enter' para continuar.")
             csv_to_sql()
-            os.remove("clinica.csv")
-            os.remove("enfermeiro.csv")
-            os.remove("medico.csv")
-            os.remove("trabalha.csv")
-            os.remove("paciente.csv")
-            os.remove("consulta.csv")
-            os.remove("receita.csv")
-            os.remove("observacao.csv")
+            remove_csv()
             print("Ficheiro SQL criado com sucesso!")
             break
-            
+
+        elif input_option == "2":
+            conninfo = input("URL da base de dados [DATABASE_URL]: ") or os.environ.get("DATABASE_URL", "")
+            defer = input("Adiar a criação de índices e restrições para o fim da carga? (s/N): ").lower() == "s"
+            copy_to_db(conninfo, defer, args.workers)
+            print("Base de dados carregada com sucesso!")
+            break
+
+        elif input_option == "3":
+            directory = input("Pasta de destino [dataset]: ") or "dataset"
+            fmt = input("Formato (parquet/arrow) [parquet]: ") or "parquet"
+            gen_columnar(directory, fmt, args.workers)
+            print(f"Conjunto de dados exportado para {directory}; carregue-o com: python columnar.py load {directory}")
+            break
+
         elif input_option == "q":
-            break
\ No newline at end of file
+            break
@@ -0,0 +1,68 @@
+-- Alternativa às restrições RI-2 e RI-3 de db_init.sql (executar depois dele).
+-- Os CHECK com funções PL/pgSQL fazem uma subconsulta por cada linha inserida em consulta;
+-- aqui as linhas de cada comando (INSERT, COPY ou UPDATE) são validadas de uma só vez,
+-- com triggers ao nível do comando sobre as tabelas de transição.
+-- dia_da_semana segue populate_v2.py (0 = segunda-feira, 6 = domingo), i.e. ISODOW - 1.
+
+ALTER TABLE consulta DROP CONSTRAINT IF EXISTS self_consulta_check;
+ALTER TABLE consulta DROP CONSTRAINT IF EXISTS clinic_day_check;
+
+-- RI-2 procura o paciente por (ssn, nif) só no índice;
+-- RI-3 usa a chave primária de trabalha (nif, dia_da_semana)
+CREATE INDEX IF NOT EXISTS paciente_ssn_nif_idx ON paciente (ssn, nif);
+
+-- Consultas que violam RI-2 ou RI-3, para validar a tabela inteira depois de uma carga
+-- feita com os triggers desativados (ALTER TABLE consulta DISABLE TRIGGER USER)
+CREATE OR REPLACE VIEW consulta_violacoes AS
+SELECT c.id, 'RI-2' AS regra
+FROM consulta c
+JOIN paciente p ON p.ssn = c.ssn AND p.nif = c.nif
+UNION ALL
+SELECT c.id, 'RI-3' AS regra
+FROM consulta c
+WHERE NOT EXISTS (
+    SELECT 1 FROM trabalha t
+    WHERE t.nif = c.nif AND t.dia_da_semana = EXTRACT(ISODOW FROM c.data) - 1
+);
+
+CREATE OR REPLACE FUNCTION check_consulta_batch() RETURNS trigger AS $$
+DECLARE
+    violacao RECORD;
+BEGIN
+    SELECT n.id INTO violacao
+    FROM novas n
+    JOIN paciente p ON p.ssn = n.ssn AND p.nif = n.nif
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'Consulta % viola RI-2: o médico não pode consultar-se a si próprio', violacao.id
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    SELECT n.id INTO violacao
+    FROM novas n
+    WHERE NOT EXISTS (
+        SELECT 1 FROM trabalha t
+        WHERE t.nif = n.nif AND t.dia_da_semana = EXTRACT(ISODOW FROM n.data) - 1
+    )
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE EXCEPTION 'Consulta % viola RI-3: o médico não trabalha nesse dia da semana', violacao.id
+            USING ERRCODE = 'check_violation';
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables only allow one event per trigger
+DROP TRIGGER IF EXISTS consulta_insert_check ON consulta;
+CREATE TRIGGER consulta_insert_check
+AFTER INSERT ON consulta
+REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION check_consulta_batch();
+
+DROP TRIGGER IF EXISTS consulta_update_check ON consulta;
+CREATE TRIGGER consulta_update_check
+AFTER UPDATE ON consulta
+REFERENCING NEW TABLE AS novas
+FOR EACH STATEMENT EXECUTE FUNCTION check_consulta_batch();
@@ -0,0 +1,78 @@
+"""Relatórios sobre a tabela de factos historial_paciente (E2/files/analytics.sql).
+
+Os relatórios leem só historial_paciente, nunca consulta/receita/observacao, e usam um pool próprio
+(REPORTING_DATABASE_URL, por omissão a mesma base) para não ocuparem as ligações das marcações.
+Para acrescentar as consultas novas, periodicamente (p.ex. por cron):
+
+    python analytics.py refresh
+"""
+import os
+import sys
+
+# Prescriptions per clinic, month and specialty; every filter is optional.
+PRESCRIPTIONS = """
+    SELECT nome AS clinica, ano, mes, especialidade,
+           count(DISTINCT id) AS consultas,
+           count(*) AS medicamentos,
+           sum(valor)::INTEGER AS quantidade
+    FROM historial_paciente
+    WHERE tipo = 'receita'
+    AND (%(clinica)s::TEXT IS NULL OR nome = %(clinica)s)
+    AND (%(ano)s::SMALLINT IS NULL OR ano = %(ano)s)
+    AND (%(especialidade)s::TEXT IS NULL OR especialidade = %(especialidade)s)
+    GROUP BY nome, ano, mes, especialidade
+    ORDER BY nome, ano, mes, especialidade
+"""
+
+# Distribution of the values of one observation parameter, per specialty.
+PARAMETER_DISTRIBUTION = """
+    SELECT especialidade,
+           count(*) AS observacoes,
+           min(valor) AS minimo,
+           percentile_cont(0.25) WITHIN GROUP (ORDER BY valor) AS p25,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY valor) AS mediana,
+           percentile_cont(0.75) WITHIN GROUP (ORDER BY valor) AS p75,
+           max(valor) AS maximo,
+           avg(valor) AS media,
+           stddev_samp(valor) AS desvio_padrao
+    FROM historial_paciente
+    WHERE tipo = 'observacao' AND chave = %(parametro)s AND valor IS NOT NULL
+    GROUP BY ROLLUP (especialidade)
+    HAVING count(*) > 0
+    ORDER BY especialidade NULLS LAST
+"""
+
+REFRESH = "SELECT refresh_historial_paciente() AS novas"
+
+
+def prescriptions(pool, clinica=None, ano=None, especialidade=None):
+    """Receitas por clínica, mês e especialidade (consultas com receita, medicamentos e quantidade total)."""
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            rows = cur.execute(PRESCRIPTIONS, {"clinica": clinica, "ano": ano, "especialidade": especialidade}).fetchall()
+    return [row._asdict() for row in rows]
+
+
+def parameter_distribution(pool, parametro):
+    """Distribuição dos valores de um parâmetro por especialidade; a linha com especialidade None é o total."""
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            rows = cur.execute(PARAMETER_DISTRIBUTION, {"parametro": parametro}).fetchall()
+    return [row._asdict() for row in rows]
+
+
+def refresh(pool):
+    """Acrescenta a historial_paciente as consultas realizadas desde o último refresh; devolve o número de linhas novas."""
+    with pool.connection() as conn:
+        return conn.execute(REFRESH).fetchone().novas
+
+
+if __name__ == "__main__":
+    from psycopg.rows import namedtuple_row
+    from psycopg_pool import ConnectionPool
+
+    if sys.argv[1:] != ["refresh"]:
+        sys.exit(f"uso: python {sys.argv[0]} refresh")
+    # The refresh writes, so it runs on the primary even when reports are read from a replica
+    with ConnectionPool(os.environ.get("DATABASE_URL"), kwargs={"autocommit": True, "row_factory": namedtuple_row}, min_size=1, max_size=1) as pool:
+        print(f"{refresh(pool)} linhas acrescentadas a historial_paciente.")
@@ -0,0 +1,74 @@
+"""Compara a app síncrona (gunicorn wsgi:app) com a assíncrona (uvicorn asgi:app) sob carga concorrente.
+
+    python bench_concurrency.py --sync http://localhost:8080 --async http://localhost:8081 \
+        --path "/c/Clinica X/radiologia/" --concurrency 10 100 1000 --requests 5000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import quote, urlsplit
+
+
+async def get(host, port, path):
+    """Faz um GET HTTP/1.1 numa nova ligação e devolve (status, latência em segundos)."""
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1]), time.perf_counter() - start
+
+
+async def run(base_url, path, concurrency, requests):
+    url = urlsplit(base_url)
+    path = quote(path)
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            try:
+                status, latency = await get(url.hostname, url.port or 80, path)
+            except OSError:
+                errors += 1
+                continue
+            if status != 200:
+                errors += 1
+            latencies.append(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000 if latencies else 0,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sync", dest="sync_url", default="http://localhost:8080")
+    parser.add_argument("--async", dest="async_url", default="http://localhost:8081")
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'app':6} {'clientes':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'erros':>6}")
+    for concurrency in args.concurrency:
+        for name, url in (("sync", args.sync_url), ("async", args.async_url)):
+            result = asyncio.run(run(url, args.path, concurrency, args.requests))
+            print(f"{name:6} {concurrency:8} {result['rps']:9.1f} {result['p50']:9.1f} {result['p99']:9.1f} {result['errors']:6}")
+
+
+if __name__ == "__main__":
+    main()
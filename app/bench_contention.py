@@ -0,0 +1,73 @@
+"""Benchmark de contenção: muitos clientes tentam marcar, ao mesmo tempo, o mesmo horário do mesmo médico.
+
+    python bench_contention.py --url http://localhost:8080 --database-url "$DATABASE_URL" --clients 50 --rounds 20
+
+Em cada ronda os clientes (pacientes diferentes) são libertados em simultâneo para o mesmo horário livre;
+deve haver exatamente um 201 e os restantes 409, sem nenhum 500. A marcação vencedora é cancelada no fim
+da ronda. Mostra as latências por código de resposta e as rondas com um número de vencedores diferente de um.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from benchmark import Client, Fixtures, Stats, percentiles
+
+
+def contend(url, clinica, bodies):
+    """Lança um pedido de marcação por corpo, todos ao mesmo tempo; devolve os códigos de resposta."""
+    stats = Stats()
+    clients = [Client(url, stats) for _ in bodies]
+    barrier = threading.Barrier(len(bodies))
+    statuses = [None] * len(bodies)
+
+    def book(k):
+        barrier.wait()
+        statuses[k], _ = clients[k].request("registar", "POST", f"/a/{clinica}/registar/", bodies[k])
+
+    threads = [threading.Thread(target=book, args=(k,)) for k in range(len(bodies))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    winners = [body for body, status in zip(bodies, statuses) if status == 201]
+    for body in winners:
+        clients[0].request("cancelar", "POST", f"/a/{clinica}/cancelar/", body)
+    return statuses, stats.latencies["registar"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--clients", type=int, default=50, help="pedidos simultâneos por horário")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fixtures = Fixtures(args.database_url)
+    rng = random.Random(args.seed)
+    statuses = Counter()
+    latencies = []
+    bad_rounds = 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        clinica, body = fixtures.appointment(rng)
+        patients = rng.sample(fixtures.patients, args.clients)
+        round_statuses, round_latencies = contend(args.url, clinica, [{**body, "paciente": ssn} for ssn in patients])
+        statuses.update(round_statuses)
+        latencies.extend(round_latencies)
+        bad_rounds += round_statuses.count(201) != 1
+    elapsed = time.perf_counter() - start
+
+    stats = percentiles(latencies)
+    print(f"{args.rounds} rondas x {args.clients} clientes em {elapsed:.1f}s ({len(latencies) / elapsed:.0f} pedidos/s)")
+    print(f"p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+    print(f"respostas: {dict(sorted(statuses.items(), key=lambda item: item[0] or 0))}")
+    print(f"rondas sem exatamente um vencedor: {bad_rounds}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Mede o arranque da app: tempo de import de wsgi.py e, com gunicorn, o tempo até à primeira resposta.
+
+    python bench_startup.py --database-url "$DATABASE_URL" --runs 5 --workers 2
+
+Compara o arranque normal (o import abre e aquece o pool) com LAZY_START=1 (o master
+importa a app uma vez e cada worker abre o pool em segundo plano depois do fork). Para cada modo mostra
+a mediana do tempo de import e, desde o lançamento do gunicorn, do primeiro 200 em /ping, em /ready e em /.
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT = "import time; start = time.perf_counter(); import wsgi; print(time.perf_counter() - start)"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def status(port, path):
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        conn.request("GET", path)
+        return conn.getresponse().status
+    except OSError:
+        return None
+
+
+def wait_for(port, path, start, timeout=60):
+    """Segundos desde `start` até `path` responder 200."""
+    while time.perf_counter() - start < timeout:
+        if status(port, path) == 200:
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    raise TimeoutError(f"{path} did not answer 200 within {timeout}s")
+
+
+def import_time(env):
+    result = subprocess.run([sys.executable, "-c", IMPORT], cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def boot_times(env, workers):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "wsgi:app", "--bind", f"127.0.0.1:{port}", "--workers", str(workers)],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    start = time.perf_counter()
+    try:
+        return wait_for(port, "/ping", start), wait_for(port, "/ready", start), wait_for(port, "/", start)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'modo':8} {'import ms':>10} {'/ping ms':>10} {'/ready ms':>10} {'/ ms':>10}")
+    for mode, lazy in (("normal", "0"), ("lazy", "1")):
+        env = {**os.environ, "DATABASE_URL": args.database_url, "LAZY_START": lazy}
+        imports = [import_time(env) for _ in range(args.runs)]
+        boots = [boot_times(env, args.workers) for _ in range(args.runs)]
+        ping, ready, first = (statistics.median(column) * 1000 for column in zip(*boots))
+        print(f"{mode:8} {statistics.median(imports) * 1000:10.0f} {ping:10.0f} {ready:10.0f} {first:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+try:
+    from redis.exceptions import RedisError
+
+    RedisErrors = (RedisError, OSError)
+except ImportError:
+    RedisErrors = (OSError,)
+
+
+class TTLCache:
+    """Cache LRU limitado a `maxsize` entradas, cada uma válida durante `ttl` segundos."""
+
+    def __init__(self, maxsize=256, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Devolve o valor de `key`, chamando `loader()` para o (re)calcular se não estiver em cache."""
+        found, value = self.lookup(key)
+        if not found:
+            # The loader runs outside the lock so a slow query does not block other keys.
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def lookup(self, key):
+        """Devolve (True, valor) se `key` está em cache e não expirou, (False, None) caso contrário."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+class SharedCache:
+    """Cache partilhada por todos os workers, num Redis (ou num substituto compatível, p.ex. fakeredis).
+
+    As chaves levam a versão do seu âmbito (p.ex. uma clínica): bump(âmbito) torna obsoletas todas as
+    entradas desse âmbito com um só INCR, e as antigas expiram pelo TTL. Quando uma entrada falta só um
+    worker a recalcula (trinco SET NX com expiração); os outros esperam até `lock_ttl` pelo resultado.
+    Se o Redis falhar, o valor é calculado localmente e o pedido segue.
+    """
+
+    def __init__(self, client, prefix="bdist", ttl=300.0, lock_ttl=5.0, poll=0.01):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.poll = poll
+        self.counts = {"hits": 0, "misses": 0, "waits": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """Liga ao Redis em `url`; "fakeredis://" usa um substituto em memória (só para testes, não é partilhado)."""
+        if url.startswith("fakeredis://"):
+            import fakeredis
+
+            return cls(fakeredis.FakeRedis(), **kwargs)
+        import redis
+
+        # Short timeouts: a slow or missing Redis must not hold up the requests
+        return cls(redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25), **kwargs)
+
+    def get(self, key, loader, scope="global"):
+        """Devolve o valor de `key` na versão atual de `scope`, calculando-o com `loader()` se faltar."""
+        loaded = False
+        try:
+            version = int(self.client.get(self._version_key(scope)) or 0)
+            name = f"{self.prefix}:{scope}:{version}:{json.dumps(key, ensure_ascii=False, separators=(',', ':'))}"
+            data = self.client.get(name)
+            if data is not None:
+                self._count("hits")
+                return self._loads(data)
+            self._count("misses")
+            token = uuid.uuid4().hex
+            lock = name + ":lock"
+            if not self.client.set(lock, token, nx=True, px=int(self.lock_ttl * 1000)):
+                return self._wait(name, loader)
+            try:
+                value = loader()
+                loaded = True
+                self.client.set(name, self._dumps(value), px=int(self.ttl * 1000))
+            finally:
+                if self.client.get(lock) == token.encode():
+                    self.client.delete(lock)
+            return value
+        except RedisErrors as e:
+            self._count("errors")
+            if loaded:
+                # Storing the value or releasing the lock failed: the value is still good
+                log.warning(f"Shared cache not updated: {e}")
+                return value
+            log.warning(f"Shared cache unavailable, computing locally: {e}")
+            return loader()
+
+    def _wait(self, name, loader):
+        """Outro worker está a calcular `name`: espera pelo valor, ou calcula-o se demorar mais que lock_ttl."""
+        self._count("waits")
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            time.sleep(self.poll)
+            data = self.client.get(name)
+            if data is not None:
+                return self._loads(data)
+        return loader()
+
+    def bump(self, scope):
+        """Invalida todas as entradas de `scope` (p.ex. depois de uma marcação ou cancelamento numa clínica)."""
+        try:
+            self.client.incr(self._version_key(scope))
+        except RedisErrors as e:
+            self._count("errors")
+            log.warning(f"Shared cache version of {scope} not bumped: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def _version_key(self, scope):
+        return f"{self.prefix}:v:{scope}"
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    @staticmethod
+    def _dumps(value):
+        # Compact JSON; large values (long doctor lists) are compressed
+        data = json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+        return b"z" + zlib.compress(data) if len(data) > 1024 else b"j" + data
+
+    @staticmethod
+    def _loads(data):
+        return json.loads(zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:])
@@ -0,0 +1,13 @@
+# Read by gunicorn from the working directory (/app in the Docker image).
+import os
+
+# In LAZY_START mode the master imports the app once (Flask, psycopg, ...) and forks ready workers;
+# the app does not connect at import, so each worker opens its own pools after the fork.
+preload_app = os.environ.get("LAZY_START") == "1"
+
+
+def post_fork(server, worker):
+    if os.environ.get("LAZY_START") == "1":
+        import app
+
+        app.start_background()
@@ -0,0 +1,121 @@
+"""Chaves de idempotência (cabeçalho Idempotency-Key) para as marcações e os cancelamentos.
+
+O primeiro pedido com uma chave reserva-a e, quando termina, a sua resposta fica guardada durante `ttl`
+segundos; as repetições da mesma chave recebem essa resposta sem voltar a tocar em consulta. Há dois
+armazenamentos com a mesma interface:
+
+- MemoryStore: em memória, limitado a `maxsize` chaves; cada worker tem o seu, por isso só apanha as
+  repetições que chegam ao mesmo worker;
+- PostgresStore: na tabela idempotencia (E2/files/idempotency.sql), partilhada por todos os workers.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+MAX_KEY_LENGTH = 255
+
+# A stored request: the fingerprint of its method, path and body, and its response once it has one
+# (status None while the first request is still running).
+Entry = namedtuple("Entry", ["fingerprint", "status", "body"])
+
+
+def fingerprint(method, path, body):
+    """Impressão digital de um pedido, para recusar a mesma chave usada com outro pedido."""
+    return hashlib.sha256(b"\0".join((method.encode(), path.encode(), body))).hexdigest()
+
+
+class MemoryStore:
+    """Respostas guardadas em memória, no máximo `maxsize` chaves (as mais antigas saem primeiro)."""
+
+    def __init__(self, maxsize=10000, ttl=86400.0, pending_ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key, fingerprint):
+        """Reserva `key` e devolve None, ou devolve a Entry já guardada se a chave estiver em uso."""
+        now = time.monotonic()
+        with self._lock:
+            found = self._data.get(key)
+            if found is not None and found[0] > now:
+                return found[1]
+            self._data[key] = (now + self.pending_ttl, Entry(fingerprint, None, None))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return None
+
+    def save(self, key, status, body):
+        """Guarda a resposta do pedido que reservou `key`."""
+        with self._lock:
+            found = self._data.get(key)
+            if found is not None:
+                self._data[key] = (time.monotonic() + self.ttl, found[1]._replace(status=status, body=body))
+
+    def release(self, key):
+        """Liberta `key` sem guardar resposta (o pedido falhou e pode ser repetido)."""
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class PostgresStore:
+    """Respostas guardadas na tabela idempotencia, partilhadas por todos os workers."""
+
+    # Claims the key unless a live entry holds it; an expired row (including an abandoned claim) is reused.
+    CLAIM = """
+        INSERT INTO idempotencia (chave, impressao, expira)
+        VALUES (%(chave)s, %(impressao)s, LOCALTIMESTAMP + make_interval(secs => %(pendente)s))
+        ON CONFLICT (chave) DO UPDATE
+            SET impressao = EXCLUDED.impressao, estado = NULL, corpo = NULL, expira = EXCLUDED.expira
+            WHERE idempotencia.expira < LOCALTIMESTAMP
+        RETURNING chave
+    """
+    LOOKUP = "SELECT impressao, estado, corpo FROM idempotencia WHERE chave = %(chave)s"
+    SAVE = """
+        UPDATE idempotencia
+        SET estado = %(estado)s, corpo = %(corpo)s, expira = LOCALTIMESTAMP + make_interval(secs => %(ttl)s)
+        WHERE chave = %(chave)s
+    """
+    RELEASE = "DELETE FROM idempotencia WHERE chave = %(chave)s AND estado IS NULL"
+    PURGE = "DELETE FROM idempotencia WHERE expira < LOCALTIMESTAMP"
+
+    def __init__(self, pool, ttl=86400.0, pending_ttl=30.0, purge_every=1000):
+        self.pool = pool
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.purge_every = purge_every
+        self._claims = 0
+        self._lock = threading.Lock()
+
+    def claim(self, key, fingerprint):
+        """Reserva `key` e devolve None, ou devolve a Entry já guardada se a chave estiver em uso."""
+        with self.pool.connection() as conn:
+            if self._due():
+                conn.execute(self.PURGE)
+            params = {"chave": key, "impressao": fingerprint, "pendente": self.pending_ttl}
+            # The row may expire or be released between the two statements: then claim again
+            for _ in range(3):
+                if conn.execute(self.CLAIM, params).fetchone() is not None:
+                    return None
+                row = conn.execute(self.LOOKUP, params).fetchone()
+                if row is not None:
+                    return Entry(row.impressao, row.estado, row.corpo)
+        raise RuntimeError(f"Could not claim idempotency key {key!r}")
+
+    def save(self, key, status, body):
+        """Guarda a resposta do pedido que reservou `key`."""
+        with self.pool.connection() as conn:
+            conn.execute(self.SAVE, {"chave": key, "estado": status, "corpo": body, "ttl": self.ttl})
+
+    def release(self, key):
+        """Liberta `key` sem guardar resposta (o pedido falhou e pode ser repetido)."""
+        with self.pool.connection() as conn:
+            conn.execute(self.RELEASE, {"chave": key})
+
+    def _due(self):
+        with self._lock:
+            self._claims += 1
+            return self._claims % self.purge_every == 0
@@ -0,0 +1,176 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+import psycopg
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+# Statements slower than SLOW_QUERY_MS are logged with their normalized SQL and the route that ran them.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+
+# Histogram buckets in seconds, from a cached catalogue read to a pool timeout.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Route template of the request being served (e.g. "/c/<clinica>/"), set by the web app.
+current_route = contextvars.ContextVar("current_route", default="none")
+
+slow_log = logging.getLogger("slow_query")
+
+
+class Histogram:
+    """Histograma cumulativo por conjunto de labels, no formato do Prometheus."""
+
+    def __init__(self, name, help, labels, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = defaultdict(lambda: [[0] * len(buckets), 0.0, 0])
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series[label_values]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = format_labels(self.labels, label_values)
+                for bound, n in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {n}')
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{labels}}} {total}")
+                lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    """Contador monótono por conjunto de labels."""
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._series[label_values] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{{{format_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def format_labels(names, values):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+request_seconds = Histogram("app_request_duration_seconds", "Duração dos pedidos HTTP.", ("route", "method", "status"))
+pool_wait_seconds = Histogram("app_pool_wait_seconds", "Tempo de espera por uma ligação do pool.", ("route",))
+pool_timeouts = Counter("app_pool_timeouts_total", "Pedidos que não obtiveram ligação do pool a tempo.", ("route",))
+query_seconds = Histogram("app_query_duration_seconds", "Duração das instruções SQL.", ("route",))
+query_rows = Counter("app_query_rows_total", "Linhas devolvidas ou afetadas pelas instruções SQL.", ("route",))
+query_errors = Counter("app_query_errors_total", "Instruções SQL que falharam.", ("route",))
+slow_queries = Counter("app_slow_queries_total", f"Instruções SQL acima de {SLOW_QUERY_MS:g} ms.", ("route",))
+idempotent_replays = Counter("app_idempotent_replays_total", "Respostas repetidas a partir de uma chave de idempotência.", ("route",))
+
+REGISTRY = [request_seconds, pool_wait_seconds, pool_timeouts, query_seconds, query_rows, query_errors, slow_queries, idempotent_replays]
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query):
+    """Reduz uma instrução SQL a uma forma canónica: espaços colapsados e literais substituídos por `?`.
+
+    Os parâmetros (%(nome)s) são mantidos, por isso a mesma instrução de queries.py dá sempre o mesmo texto.
+    """
+    query = _STRING.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    return _SPACE.sub(" ", query).strip()
+
+
+class TimedCursor(psycopg.Cursor):
+    """Cursor que regista a duração e o número de linhas de cada instrução na rota atual."""
+
+    def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        except psycopg.Error:
+            query_errors.inc(current_route.get())
+            raise
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def executemany(self, query, params_seq, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        except psycopg.Error:
+            query_errors.inc(current_route.get())
+            raise
+        finally:
+            self._record(query, time.perf_counter() - start)
+
+    def _record(self, query, elapsed):
+        route = current_route.get()
+        query_seconds.observe(elapsed, route)
+        query_rows.inc(route, amount=max(self.rowcount, 0))
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_queries.inc(route)
+            if not isinstance(query, str):
+                query = query.as_string(self)
+            slow_log.warning(f"Slow query on {route}: {elapsed * 1000:.1f} ms, {self.rowcount} rows: {normalize_sql(query)}")
+
+
+class InstrumentedPool(ConnectionPool):
+    """ConnectionPool que mede o tempo de espera por cada ligação, por rota."""
+
+    def getconn(self, timeout=None):
+        start = time.perf_counter()
+        try:
+            return super().getconn(timeout=timeout)
+        except PoolTimeout:
+            pool_timeouts.inc(current_route.get())
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - start, current_route.get())
+
+
+def render(*pools):
+    """Devolve todas as métricas no formato de texto do Prometheus, incluindo o estado atual de cada pool."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    stats = [(pool.name, pool.get_stats(), pool.max_size) for pool in pools]
+    for key, help in (
+        ("pool_size", "Ligações abertas pelo pool."),
+        ("pool_available", "Ligações livres no pool."),
+        ("requests_waiting", "Pedidos à espera de uma ligação."),
+        ("pool_max", "Máximo de ligações do pool."),
+    ):
+        name = key if key.startswith("pool_") else f"pool_{key}"
+        lines.append(f"# HELP app_{name} {help}")
+        lines.append(f"# TYPE app_{name} gauge")
+        for pool_name, pool_stats, max_size in stats:
+            value = max_size if key == "pool_max" else pool_stats.get(key, 0)
+            lines.append(f'app_{name}{{pool="{pool_name}"}} {value}')
+    return "\n".join(lines) + "\n"
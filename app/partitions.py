@@ -0,0 +1,22 @@
+"""Manutenção das partições mensais de consulta, no esquema particionado (E2/files/partitioning.sql).
+
+Cria as partições do mês corrente e dos PARTITION_MONTHS meses seguintes que ainda não existem, para
+que as novas marcações não caiam na partição por omissão. Para correr periodicamente (p.ex. por cron):
+
+    python partitions.py
+"""
+import os
+
+import psycopg
+
+CREATE_FUTURE = "SELECT criar_particoes_futuras(%(meses)s)"
+
+
+def create_future(conn, months=3):
+    """Cria as partições que faltam até `months` meses à frente; devolve quantas criou."""
+    return conn.execute(CREATE_FUTURE, {"meses": months}).fetchone()[0]
+
+
+if __name__ == "__main__":
+    with psycopg.connect(os.environ.get("DATABASE_URL"), autocommit=True) as conn:
+        print(f"{create_future(conn, int(os.environ.get('PARTITION_MONTHS', 3)))} partições criadas.")
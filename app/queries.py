@@ -0,0 +1,177 @@
+# SQL statements shared by the WSGI (app.py) and ASGI (asgi.py) apps, so both return the same data.
+import logging
+import time
+from datetime import date, time as time_of_day
+
+import psycopg
+
+log = logging.getLogger(__name__)
+
+# Number of free slots listed per doctor and how many days ahead to look for them.
+# trabalha.dia_da_semana follows populate_v2.py (Python's weekday(): 0 = Monday, 6 = Sunday).
+SLOTS_PER_DOCTOR = 3
+SLOT_HORIZON_DAYS = 28
+
+# Maximum page size for keyset pagination (?limite=); without it the full list is returned.
+MAX_PAGE_SIZE = 1000
+
+# The list statements page by their (unique) sort key: %(depois)s is the last key of the previous
+# page and %(pagina)s the page size, both NULL for the whole list (LIMIT NULL is LIMIT ALL).
+LIST_CLINICS = """
+    SELECT nome, morada
+    FROM clinica
+    WHERE %(depois)s::TEXT IS NULL OR nome > %(depois)s
+    ORDER BY nome
+    LIMIT %(pagina)s
+"""
+
+LIST_SPECIALTIES = """
+    SELECT DISTINCT m.especialidade
+    FROM medico m
+    JOIN trabalha t ON t.nif = m.nif
+    WHERE t.nome = %(clinica)s
+    AND (%(depois)s::TEXT IS NULL OR m.especialidade > %(depois)s)
+    ORDER BY m.especialidade
+    LIMIT %(pagina)s
+"""
+
+# Free slots are derived in a single query: the half-hour grid of RI-1 is crossed with
+# the days each doctor works at this clinic (trabalha) and the slots already taken in
+# consulta are removed, keeping the first SLOTS_PER_DOCTOR per doctor.
+LIST_DOCTORS = """
+    WITH grelha AS (
+        SELECT dia::date AS data,
+               TIME '08:00' + make_interval(mins => 30 * n + CASE WHEN n >= 10 THEN 60 ELSE 0 END) AS hora
+        FROM generate_series(CURRENT_DATE, CURRENT_DATE + %(horizonte)s, INTERVAL '1 day') AS dia,
+             generate_series(0, 19) AS n
+    ),
+    medicos AS (
+        SELECT DISTINCT m.nif, m.nome
+        FROM medico m
+        JOIN trabalha t ON t.nif = m.nif
+        WHERE t.nome = %(clinica)s
+        AND m.especialidade = %(especialidade)s
+        AND (%(depois)s::TEXT IS NULL OR m.nome > %(depois)s)
+        ORDER BY m.nome
+        LIMIT %(pagina)s
+    )
+    SELECT m.nome,
+           COALESCE(
+               json_agg(json_build_object('data', h.data, 'hora', h.hora) ORDER BY h.data, h.hora)
+               FILTER (WHERE h.data IS NOT NULL),
+               '[]'
+           ) AS horarios
+    FROM medicos m
+    LEFT JOIN LATERAL (
+        SELECT g.data, g.hora
+        FROM grelha g
+        JOIN trabalha t ON t.nif = m.nif
+                       AND t.nome = %(clinica)s
+                       AND t.dia_da_semana = EXTRACT(ISODOW FROM g.data) - 1
+        WHERE g.data + g.hora > LOCALTIMESTAMP
+        AND NOT EXISTS (
+            SELECT 1 FROM consulta c
+            WHERE c.nif = m.nif AND c.data = g.data AND c.hora = g.hora
+            -- Constant bounds let a partitioned consulta skip the months outside the grid
+            AND c.data BETWEEN CURRENT_DATE AND CURRENT_DATE + %(horizonte)s
+        )
+        ORDER BY g.data, g.hora
+        LIMIT %(limite)s
+    ) h ON TRUE
+    GROUP BY m.nif, m.nome
+    ORDER BY m.nome
+"""
+
+# Books a slot without raising on double-bookings: returns the new id, or no row if the slot is
+# taken. ON CONFLICT DO NOTHING covers the doctor's slot (UNIQUE(nif, data, hora)) and the patient
+# already booked at that time (UNIQUE(ssn, data, hora)). A request racing an uncommitted booking of
+# the same slot waits for it on the index entry, so it answers 409 only once that booking has
+# committed, and books the slot itself if the other one rolled back.
+RESERVE_APPOINTMENT = """
+    INSERT INTO consulta (ssn, nif, nome, data, hora)
+    VALUES (%(paciente)s, %(medico)s, %(clinica)s, %(data)s, %(hora)s)
+    ON CONFLICT DO NOTHING
+    RETURNING id
+"""
+
+# Errors caused by the appointment itself (a constraint, an RI trigger, a value the column rejects),
+# answered with 400 by both apps; anything else (connection loss, timeouts) is the server's (500).
+APPOINTMENT_ERRORS = (psycopg.errors.IntegrityError, psycopg.errors.RaiseException, psycopg.errors.DataError)
+
+DELETE_APPOINTMENT = """
+    DELETE FROM consulta
+    WHERE nome = %(clinica)s AND ssn = %(paciente)s AND nif = %(medico)s
+    AND data = %(data)s AND hora = %(hora)s
+    AND data + hora > LOCALTIMESTAMP
+"""
+
+
+def clinics_params(depois=None, pagina=None):
+    return {"depois": depois, "pagina": pagina}
+
+
+def specialties_params(clinica, depois=None, pagina=None):
+    return {"clinica": clinica, "depois": depois, "pagina": pagina}
+
+
+def doctors_params(clinica, especialidade, depois=None, pagina=None):
+    return {
+        "clinica": clinica,
+        "especialidade": especialidade,
+        "horizonte": SLOT_HORIZON_DAYS,
+        "limite": SLOTS_PER_DOCTOR,
+        "depois": depois,
+        "pagina": pagina,
+    }
+
+
+# Statements prepared on every pool connection (see prepare()), with the parameters used to run
+# each of them once. psycopg keys its prepared statements by SQL text and parameter types, so the
+# warm-up parameters have the same Python types as the ones the routes pass. Only cheap statements
+# belong here, as each new connection runs all of them: the lists are small (the doctors one reads
+# no clinic), the DELETE matches no row and the reservation targets a slot that is already taken.
+def prepared_statements(booked):
+    nif, data, hora = booked if booked else ("", date.today(), time_of_day(8))
+    appointment = {"clinica": "", "paciente": "", "medico": nif, "data": data, "hora": hora}
+    statements = {
+        "list_clinics": (LIST_CLINICS, clinics_params()),
+        "list_specialties": (LIST_SPECIALTIES, specialties_params("")),
+        "list_doctors": (LIST_DOCTORS, doctors_params("", "")),
+        "delete_appointment": (DELETE_APPOINTMENT, appointment),
+    }
+    if booked:
+        statements["reserve_appointment"] = (RESERVE_APPOINTMENT, appointment)
+    return statements
+
+
+def prepare(conn):
+    """Hook `configure` do pool: prepara no servidor as instruções de prepared_statements() nesta ligação.
+
+    Cada instrução é executada uma vez com prepare=True; o psycopg reutiliza-a nas execuções seguintes
+    com o mesmo SQL e os mesmos tipos de parâmetros.
+    """
+    start = time.perf_counter()
+    booked = conn.execute("SELECT nif, data, hora FROM consulta LIMIT 1", prepare=False).fetchone()
+    prepared = 0
+    for name, (statement, params) in prepared_statements(booked).items():
+        try:
+            conn.execute(statement, params, prepare=True)
+            prepared += 1
+        except psycopg.Error as e:
+            log.warning(f"Could not prepare {name}: {e}")
+    log.info(f"Prepared {prepared} statements on a new connection in {(time.perf_counter() - start) * 1000:.1f} ms.")
+
+
+async def aprepare(conn):
+    """Como prepare(), para o AsyncConnectionPool de asgi.py."""
+    start = time.perf_counter()
+    cur = await conn.execute("SELECT nif, data, hora FROM consulta LIMIT 1", prepare=False)
+    booked = await cur.fetchone()
+    prepared = 0
+    for name, (statement, params) in prepared_statements(booked).items():
+        try:
+            await conn.execute(statement, params, prepare=True)
+            prepared += 1
+        except psycopg.Error as e:
+            log.warning(f"Could not prepare {name}: {e}")
+    log.info(f"Prepared {prepared} statements on a new connection in {(time.perf_counter() - start) * 1000:.1f} ms.")
@@ -0,0 +1,127 @@
+"""Corre EXPLAIN (ANALYZE, BUFFERS) sobre as instruções de cada rota de app.py e assinala sequential scans.
+
+    python query_advisor.py --database-url postgresql://... [--min-rows 1000] [--plans] [--strict]
+
+Os parâmetros são tirados da própria base de dados (uma clínica, especialidade e consulta reais), por isso
+deve ser corrida sobre uma base carregada com populate_v2.py. As escritas são desfeitas no fim.
+Com --strict termina com código 1 se houver algum sequential scan sobre `--min-rows` ou mais linhas.
+"""
+import argparse
+import os
+import sys
+
+import psycopg
+from psycopg.rows import namedtuple_row
+
+import queries
+
+
+def sample_params(cur):
+    """Escolhe uma clínica com médicos, uma especialidade dessa clínica e a consulta futura mais próxima."""
+    clinic = cur.execute("""
+        SELECT t.nome AS clinica, m.especialidade
+        FROM trabalha t JOIN medico m ON m.nif = t.nif
+        GROUP BY t.nome, m.especialidade
+        ORDER BY count(*) DESC
+        LIMIT 1
+    """).fetchone()
+    if clinic is None:
+        sys.exit("A base de dados não tem médicos em nenhuma clínica; carregue-a com populate_v2.py.")
+    appointment = cur.execute("""
+        SELECT nome AS clinica, ssn AS paciente, nif AS medico, data, hora
+        FROM consulta
+        ORDER BY data + hora > LOCALTIMESTAMP DESC, abs(data - CURRENT_DATE), hora
+        LIMIT 1
+    """).fetchone()
+    return clinic, appointment._asdict() if appointment else None
+
+
+def statements(clinic, appointment):
+    """(rota, instrução, parâmetros) pela ordem em que são executadas; o DELETE liberta o horário do INSERT."""
+    yield "GET /", queries.LIST_CLINICS, queries.clinics_params()
+    yield "GET /c/<clinica>/", queries.LIST_SPECIALTIES, queries.specialties_params(clinic.clinica)
+    yield "GET /c/<clinica>/<especialidade>/", queries.LIST_DOCTORS, queries.doctors_params(clinic.clinica, clinic.especialidade)
+    if appointment:
+        yield "POST /a/<clinica>/cancelar/", queries.DELETE_APPOINTMENT, appointment
+        yield "POST /a/<clinica>/registar/", queries.RESERVE_APPOINTMENT, appointment
+
+
+def walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def seq_scans(plan, min_rows):
+    """Sequential scans do plano que leram pelo menos `min_rows` linhas (devolvidas + removidas pelo filtro)."""
+    for node in walk(plan):
+        if node["Node Type"] != "Seq Scan":
+            continue
+        loops = node.get("Actual Loops", 1) or 1
+        scanned = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops
+        if scanned >= min_rows:
+            yield node["Relation Name"], scanned, node.get("Filter")
+
+
+def explain(cur, statement, params):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, params)
+    return cur.fetchone()[0][0]
+
+
+def explain_text(cur, statement, params):
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, params)
+    return "\n".join(row[0] for row in cur.fetchall())
+
+
+def analyse(route, result, text, min_rows):
+    """Imprime o resumo de uma instrução e devolve True se tiver sequential scans."""
+    plan = result["Plan"]
+    scans = list(seq_scans(plan, min_rows))
+    trigger_ms = sum(t["Time"] for t in result.get("Triggers", []))
+    print(
+        f"{route:40} {result['Execution Time']:9.2f} {plan.get('Shared Hit Blocks', 0):8} {plan.get('Shared Read Blocks', 0):8}  "
+        + (", ".join(f"{table} ({rows} linhas)" for table, rows, _ in scans) or "-")
+        + (f"  [triggers {trigger_ms:.2f} ms]" if trigger_ms else "")
+    )
+    for table, _, condition in scans:
+        print(f"{'':40}   ! Seq Scan on {table}" + (f" com filtro {condition}" if condition else ""))
+    if scans and text:
+        print("\n".join(f"{'':43}{line}" for line in text.splitlines()))
+    return bool(scans)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--min-rows", type=int, default=1000, help="ignora sequential scans sobre menos linhas (tabelas pequenas)")
+    parser.add_argument("--plans", action="store_true", help="mostra o plano completo das instruções assinaladas")
+    parser.add_argument("--strict", action="store_true", help="termina com código 1 se houver sequential scans")
+    args = parser.parse_args()
+
+    flagged = 0
+    with psycopg.connect(args.database_url, row_factory=namedtuple_row) as conn:
+        with conn.cursor() as cur:
+            clinic, appointment = sample_params(cur)
+            print(f"clínica {clinic.clinica!r}, especialidade {clinic.especialidade!r}")
+            print(f"{'rota':40} {'ms':>9} {'hit':>8} {'read':>8}  sequential scans")
+            # One transaction, rolled back at the end, so the INSERT sees the slot freed by the DELETE
+            with conn.transaction(force_rollback=True):
+                for route, statement, params in statements(clinic, appointment):
+                    try:
+                        text = None
+                        if args.plans:
+                            with conn.transaction(force_rollback=True):
+                                text = explain_text(cur, statement, params)
+                        with conn.transaction():
+                            result = explain(cur, statement, params)
+                    except psycopg.Error as e:
+                        print(f"{route:40} erro: {str(e).splitlines()[0]}")
+                        continue
+                    flagged += analyse(route, result, text, args.min_rows)
+    if flagged:
+        print(f"\n{flagged} instrução(ões) com sequential scans; veja E2/files/indexes.sql.")
+    sys.exit(1 if flagged and args.strict else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from datetime import datetime, time
+
+# Half-hour grid allowed by RI-1 (consulta_time_check): 08:00-12:30 and 14:00-18:30.
+SLOT_TIMES = [time(start + m // 60, m % 60) for start in (8, 14) for m in range(0, 300, 30)]
+SLOT_OF_TIME = {t: i for i, t in enumerate(SLOT_TIMES)}
+
+
+def slot_of(hora):
+    """Devolve o índice (0-19) do horário `hora` na grelha, ou None se não for um horário válido."""
+    if isinstance(hora, str):
+        hora = time.fromisoformat(hora)
+    return SLOT_OF_TIME.get(hora)
+
+
+def split_data_hora(data_hora):
+    """Separa um valor "YYYY-MM-DD HH:MM[:SS]" (ou datetime) em (data, hora)."""
+    if isinstance(data_hora, str):
+        data_hora = datetime.fromisoformat(data_hora)
+    return data_hora.date(), data_hora.time()
+
+
+# Reply (409) when the database finds the slot taken by the doctor or the patient.
+SLOT_TAKEN = "O médico ou o paciente já tem uma consulta marcada nesse horário."
+
+
+def parse_request(clinica, data):
+    """Valida os campos comuns ao registo e ao cancelamento; devolve (parâmetros, None) ou (None, (mensagem, código HTTP))."""
+    if not isinstance(data, dict):
+        return None, ("É necessário um objeto JSON com paciente, médico e data/hora.", 400)
+    paciente = data.get('paciente')
+    medico = data.get('medico')
+    data_hora = data.get('data_hora')
+
+    if not paciente or not medico or not data_hora:
+        return None, ("Paciente, médico e data/hora são necessários.", 400)
+    if not all(isinstance(value, str) for value in (paciente, medico, data_hora)):
+        return None, ("Paciente, médico e data/hora têm de ser texto.", 400)
+
+    try:
+        dia, hora = split_data_hora(data_hora)
+    except ValueError:
+        return None, ("Data/hora inválida.", 400)
+    return {"clinica": clinica, "paciente": paciente, "medico": medico, "data": dia, "hora": hora}, None
+
+
+def parse_appointment(clinica, data):
+    """Como parse_request, verificando também que o horário está na grelha."""
+    appointment, error = parse_request(clinica, data)
+    if error:
+        return None, error
+    if slot_of(appointment["hora"]) is None:
+        return None, ("Horário fora do período de consultas.", 400)
+    return appointment, None